@@ -3,6 +3,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from config import config
+from app import cache, metrics
 
 db = SQLAlchemy()
 login_manager = LoginManager()
@@ -16,6 +17,12 @@ def create_app(config_name='default'):
     db.init_app(app)
     login_manager.init_app(app)
     migrate.init_app(app, db)
+    metrics.init_app(app)
+    cache.init_app(app)
+    # Logged-in users' rows (see models.load_user), per process
+    if app.config['USER_CACHE_TTL']:
+        app.extensions['user_cache'] = cache.MemoryCache(app.config['USER_CACHE_MAX_ENTRIES'],
+                                                         app.config['USER_CACHE_TTL'])
 
     from app.main import bp as main_bp
     app.register_blueprint(main_bp)
@@ -29,4 +36,13 @@ def create_app(config_name='default'):
     from app.candidates import bp as candidates_bp
     app.register_blueprint(candidates_bp, url_prefix='/candidates')
 
+    from app.candidates.ingestion import ingestion_queue
+    ingestion_queue.init_app(app)
+
+    from app.api import bp as api_bp
+    app.register_blueprint(api_bp, url_prefix='/api')
+
+    from app.commands import register_commands
+    register_commands(app)
+
     return app
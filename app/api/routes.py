@@ -0,0 +1,217 @@
+import hmac
+import json
+from functools import wraps
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from flask import Response, current_app, jsonify, request, stream_with_context
+from flask_login import current_user
+from app import db, login_manager
+from app.api import bp
+from app.jobs.index import text_job_scores
+from app.jobs.scores import (ID_CHUNK_SIZE, candidate_data, candidate_scores, get_scoring_policy, job_data,
+                             match_details, pair_scores)
+from app.models import Candidate, JobOffer, User
+from app.nlp.matching import match_many
+from app.nlp.preprocessing import preprocess_cvs
+
+# Texts analysed per nlp.pipe batch by /api/analyze, each batch streamed as it completes
+ANALYZE_BATCH_SIZE = 32
+
+@login_manager.request_loader
+def load_user_from_token(request):
+    """Authenticates API clients (e.g. an ATS) with 'Authorization: Bearer <token>', see API_TOKENS."""
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+    token = header[len('Bearer '):].strip()
+    for known_token, email in current_app.config['API_TOKENS'].items():
+        if hmac.compare_digest(known_token.encode('utf-8'), token.encode('utf-8')):
+            return User.query.filter_by(email=email).first()
+    return None
+
+def _error(message: str, status: int):
+    return jsonify({"error": message}), status
+
+def api_login_required(view):
+    """Like login_required, but answers 401 in JSON instead of redirecting to the login page."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return _error('Authentification requise.', 401)
+        return view(*args, **kwargs)
+    return wrapper
+
+def _payload() -> Dict[str, Any]:
+    payload = request.get_json(silent=True)
+    return payload if isinstance(payload, dict) else {}
+
+def _id_list(payload: Dict[str, Any], key: str):
+    """The list of ids under key, or None when it is missing, malformed or too long."""
+    ids = payload.get(key)
+    if not isinstance(ids, list) or not ids or len(ids) > current_app.config['API_MAX_BATCH'] \
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return None
+    return list(dict.fromkeys(ids))
+
+def _respond(results: Iterable[Dict[str, Any]], **fields):
+    """
+    One JSON document, or one JSON line per result streamed as it is
+    produced when the client asks for application/x-ndjson (or ?format=ndjson).
+    """
+    ndjson = request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+    if ndjson:
+        lines = (json.dumps(result, ensure_ascii=False) + "\n" for result in results)
+        return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+    return jsonify({**fields, "results": list(results)})
+
+def _match_fields(details: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "score": details["total_score"],
+        "skill_score": details["skill_score"],
+        "text_similarity": details["text_similarity"],
+        "education_score": details["education_score"],
+        "matching_skills": details["matching_skills"],
+        "missing_skills": details["missing_skills"]
+    }
+
+@bp.route('/jobs/<int:job_id>/scores', methods=['POST'])
+@api_login_required
+def score_candidates(job_id):
+    """Scores of a batch of candidates against one offer: {"candidate_ids": [...]}."""
+    job = db.session.get(JobOffer, job_id)
+    if job is None:
+        return _error('Offre introuvable.', 404)
+    if current_user.role != 'company' or not current_user.company_profile \
+            or job.company_id != current_user.company_profile.id:
+        return _error('Accès non autorisé.', 403)
+    candidate_ids = _id_list(_payload(), 'candidate_ids')
+    if candidate_ids is None:
+        return _error(f"candidate_ids doit être une liste de 1 à {current_app.config['API_MAX_BATCH']} "
+                      f"identifiants.", 400)
+
+    source = job_data(job, text=False)
+
+    def results() -> Iterator[Dict[str, Any]]:
+        for start in range(0, len(candidate_ids), ID_CHUNK_SIZE):
+            chunk = candidate_ids[start:start + ID_CHUNK_SIZE]
+            found = {candidate.id: candidate for candidate in Candidate.query.filter(Candidate.id.in_(chunk))}
+            analysed = [found[i] for i in chunk if i in found and found[i].skills]
+            # Missing pairs are computed in one MatchBatch, details in another
+            scores = pair_scores(job, analysed)
+            details = match_details(source, [candidate_data(candidate, text=False) for candidate in analysed],
+                                    scores, [job.company_id])
+            matches = {candidate.id: _match_fields(detail) for candidate, detail in zip(analysed, details)}
+            for candidate_id in chunk:
+                if candidate_id in matches:
+                    yield {"candidate_id": candidate_id, **matches[candidate_id]}
+                else:
+                    yield {"candidate_id": candidate_id,
+                           "error": "not_analyzed" if candidate_id in found else "not_found"}
+
+    return _respond(results(), job_id=job.id)
+
+def _viewer_scope():
+    """
+    (company_id, user_id): a company only ranks its own offers, a candidate
+    only sees their own profile. None for a company account without a profile.
+    """
+    if current_user.role == 'company':
+        return (current_user.company_profile.id, None) if current_user.company_profile else None
+    return None, current_user.id
+
+def _top_jobs(candidate_ids: List[int], k: int, company_id: Optional[int],
+              user_id: Optional[int]) -> Iterator[Dict[str, Any]]:
+    """Best k offers of each candidate from the stored scores, within the viewer scope."""
+    for start in range(0, len(candidate_ids), ID_CHUNK_SIZE):
+        chunk = candidate_ids[start:start + ID_CHUNK_SIZE]
+        found = {candidate.id: candidate for candidate in Candidate.query.filter(Candidate.id.in_(chunk))}
+        for candidate_id in chunk:
+            candidate = found.get(candidate_id)
+            if candidate is None or (user_id is not None and candidate.user_id != user_id):
+                yield {"candidate_id": candidate_id, "error": "not_found"}
+                continue
+            if not candidate.skills:
+                yield {"candidate_id": candidate_id, "error": "not_analyzed"}
+                continue
+            scored = candidate_scores(candidate, k, company_id)
+            details = match_details(candidate_data(candidate, text=False),
+                                    [job_data(job, text=False) for job, _ in scored],
+                                    [score for _, score in scored], [job.company_id for job, _ in scored])
+            yield {"candidate_id": candidate_id, "jobs": [
+                {"job_id": job.id, "title": job.title, **_match_fields(detail)}
+                for (job, _), detail in zip(scored, details)
+            ]}
+
+def _k() -> int:
+    return max(1, min(request.args.get('k', 10, type=int), current_app.config['API_MAX_BATCH']))
+
+@bp.route('/candidates/<int:candidate_id>/jobs')
+@api_login_required
+def candidate_top_jobs(candidate_id):
+    """Best ?k= offers for one candidate."""
+    scope = _viewer_scope()
+    if scope is None:
+        return _error('Accès non autorisé.', 403)
+    result = next(_top_jobs([candidate_id], _k(), *scope))
+    if "error" in result:
+        return _error('Candidat introuvable.' if result["error"] == "not_found" else 'CV non analysé.', 404)
+    return jsonify(result)
+
+@bp.route('/candidates/jobs', methods=['POST'])
+@api_login_required
+def candidates_top_jobs():
+    """Best ?k= offers for a batch of candidates: {"candidate_ids": [...]}."""
+    candidate_ids = _id_list(_payload(), 'candidate_ids')
+    if candidate_ids is None:
+        return _error(f"candidate_ids doit être une liste de 1 à {current_app.config['API_MAX_BATCH']} "
+                      f"identifiants.", 400)
+    scope = _viewer_scope()
+    if scope is None:
+        return _error('Accès non autorisé.', 403)
+    k = _k()
+    return _respond(_top_jobs(candidate_ids, k, *scope), k=k)
+
+@bp.route('/analyze', methods=['POST'])
+@api_login_required
+def analyze_texts():
+    """
+    Skills, education, emails and entities of CV texts: {"texts": [...]},
+    optionally scored against an offer with "job_id" (a company's own offers only).
+    """
+    payload = _payload()
+    texts = payload.get('texts')
+    if not isinstance(texts, list) or not texts or len(texts) > current_app.config['API_MAX_BATCH'] \
+            or not all(isinstance(text, str) for text in texts):
+        return _error(f"texts doit être une liste de 1 à {current_app.config['API_MAX_BATCH']} textes.", 400)
+    job = None
+    if payload.get('job_id') is not None:
+        job = db.session.get(JobOffer, payload['job_id']) if isinstance(payload['job_id'], int) else None
+        if job is None:
+            return _error('Offre introuvable.', 404)
+        scope = _viewer_scope()
+        if scope is None or (scope[0] is not None and job.company_id != scope[0]):
+            return _error('Accès non autorisé.', 403)
+
+    policy = get_scoring_policy()
+
+    def results() -> Iterator[Dict[str, Any]]:
+        for start in range(0, len(texts), ANALYZE_BATCH_SIZE):
+            analyses = preprocess_cvs(texts[start:start + ANALYZE_BATCH_SIZE], batch_size=ANALYZE_BATCH_SIZE)
+            matches = [None] * len(analyses)
+            if job is not None:
+                cleaned_texts = [analysis['cleaned_text'] for analysis in analyses]
+                matches = match_many(job_data(job, text=False), analyses, text_job_scores(job, cleaned_texts),
+                                     policy, policy.weights_for([job.company_id]))
+            for i, (analysis, match) in enumerate(zip(analyses, matches)):
+                result = {
+                    "index": start + i,
+                    "skills": analysis['skills'],
+                    "education": analysis['education'],
+                    "emails": analysis['emails'],
+                    "entities": analysis['entities']
+                }
+                if match is not None:
+                    result["match"] = _match_fields(match)
+                yield result
+
+    return _respond(results(), job_id=job.id if job else None)
@@ -17,6 +17,11 @@ def login():
             flash('Email ou mot de passe invalide', 'danger')
             return redirect(url_for('auth.login'))
         
+        if user.password_needs_rehash():
+            # The password is only known here: upgrade the hash to the current policy
+            user.set_password(form.password.data)
+            db.session.commit()
+
         login_user(user, remember=form.remember_me.data)
         next_page = request.args.get('next')
         if not next_page or not next_page.startswith('/'):
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Sequence, Tuple
+from flask import current_app, request, session
+from app import metrics
+
+# (etag, body) of a rendered page
+Entry = Tuple[str, bytes]
+
+class MemoryCache:
+    """In-process LRU (of rendered pages, of users) whose entries expire after ttl seconds."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: 'OrderedDict[str, Tuple[float, Entry]]' = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            expires, entry = item
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Entry):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, entry)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+class FileCache:
+    """
+    Rendered pages as files in a directory, shared by every worker of a
+    host (or by several hosts on a shared volume). Entries expire ttl
+    seconds after being written; the oldest files are removed once there
+    are more than max_entries.
+    """
+
+    def __init__(self, directory: str, max_entries: int, ttl: float):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.page")
+
+    def get(self, key: str) -> Optional[Entry]:
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl < time.time():
+                return None
+            with open(path, 'rb') as f:
+                etag, _, body = f.read().partition(b'\n')
+            return etag.decode('ascii'), body
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def set(self, key: str, entry: Entry):
+        # Write then rename so other workers never read a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        etag, body = entry
+        with os.fdopen(fd, 'wb') as f:
+            f.write(etag.encode('ascii') + b'\n' + body)
+        os.replace(tmp_path, self._path(key))
+        self.writes += 1
+        if self.writes % 100 == 0:
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.page'):
+                path = os.path.join(self.directory, filename)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        entries.sort()
+        expired = time.time() - self.ttl
+        excess = len(entries) - self.max_entries
+        for i, (modified, path) in enumerate(entries):
+            if i >= excess and modified >= expired:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+
+def init_app(app):
+    """Creates the page cache selected by RESPONSE_CACHE_BACKEND ('memory', 'file' or 'none')."""
+    backend = app.config.get('RESPONSE_CACHE_BACKEND', 'memory')
+    max_entries = app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024)
+    ttl = app.config.get('RESPONSE_CACHE_TTL', 60)
+    if backend == 'memory':
+        app.extensions['response_cache'] = MemoryCache(max_entries, ttl)
+    elif backend == 'file':
+        app.extensions['response_cache'] = FileCache(app.config['RESPONSE_CACHE_FOLDER'], max_entries, ttl)
+
+def cached_page(key: Sequence[Any], render: Callable[[], str]):
+    """
+    Serves a rendered page from the cache, rendering and storing it on a
+    miss. key must hold everything the page depends on (viewer, catalogue
+    version...), so that an entry is never served once its data changed:
+    invalidation is a new key. The response carries an ETag and answers
+    If-None-Match with a 304.
+
+    Pages rendered while flash messages are pending are not cached, since
+    the messages are part of the page.
+    """
+    cache = current_app.extensions.get('response_cache')
+    if cache is None or session.get('_flashes'):
+        body = render().encode('utf-8')
+        entry = (hashlib.sha256(body).hexdigest()[:32], body)
+    else:
+        digest = hashlib.sha256(json.dumps(list(key), default=str).encode('utf-8')).hexdigest()
+        entry = cache.get(digest)
+        metrics.registry.increment('response_cache_hits' if entry else 'response_cache_misses')
+        if entry is None:
+            body = render().encode('utf-8')
+            entry = (hashlib.sha256(body).hexdigest()[:32], body)
+            cache.set(digest, entry)
+
+    etag, body = entry
+    response = current_app.response_class(body, mimetype='text/html')
+    response.set_etag(etag)
+    # Pages depend on the session: browsers may keep them but must revalidate
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
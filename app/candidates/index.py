@@ -0,0 +1,71 @@
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Candidate, Skill, candidate_skill
+from app.nlp.skill_index import SkillIndex
+
+skill_index = SkillIndex()
+
+# Profiles analysed shortly before a sync may be committed after it
+SYNC_LAG = timedelta(seconds=30)
+
+# First sync time when no candidate has been analysed yet
+EPOCH = datetime(1970, 1, 1)
+
+@event.listens_for(Session, 'after_flush')
+def _mark_skill_index_stale(session, flush_context):
+    # Profiles (re)analysed by this process are indexed on the next call
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Candidate) and inspect(obj).attrs.analyzed_at.history.has_changes():
+            skill_index.stale = True
+            return
+
+def get_skill_index() -> SkillIndex:
+    """
+    Returns the process-wide skill index, first reloading the candidates
+    analysed since the last sync. The database is only checked once this
+    process flushed an analysis, or every SKILL_INDEX_SYNC_INTERVAL seconds
+    for the profiles analysed by another worker. The first call loads every
+    candidate; later ones only re-read the profiles analysed within
+    SYNC_LAG of the previous sync, which the analyzed_at index keeps cheap.
+
+    analyzed_at is set before commit, so a profile committed more than
+    SYNC_LAG later (e.g. by import-cvs, which commits in batches) escapes
+    the incremental sync: every SKILL_INDEX_FULL_SYNC_INTERVAL seconds the
+    whole index is reloaded instead.
+    """
+    now = time.monotonic()
+    if skill_index.synced_at is not None and not skill_index.stale and \
+            now - skill_index.checked_at < current_app.config['SKILL_INDEX_SYNC_INTERVAL']:
+        return skill_index
+    skill_index.stale = False
+    skill_index.checked_at = now
+    full = skill_index.synced_at is None or \
+        now - skill_index.full_synced_at >= current_app.config['SKILL_INDEX_FULL_SYNC_INTERVAL']
+
+    latest = db.session.query(db.func.max(Candidate.analyzed_at)).scalar()
+    if not full and latest is None:
+        return skill_index
+
+    query = db.session.query(Candidate.id, Skill.name) \
+        .outerjoin(candidate_skill, candidate_skill.c.candidate_id == Candidate.id) \
+        .outerjoin(Skill, Skill.id == candidate_skill.c.skill_id)
+    if not full:
+        query = query.filter(Candidate.analyzed_at >= skill_index.synced_at - SYNC_LAG)
+
+    profiles = {}
+    for candidate_id, name in query:
+        skills = profiles.setdefault(candidate_id, [])
+        if name is not None:
+            skills.append(name)
+    if full:
+        # Candidates gone from the database leave the index
+        for candidate_id in skill_index.candidate_ids() - profiles.keys():
+            profiles[candidate_id] = []
+        skill_index.full_synced_at = now
+    skill_index.update(profiles)
+    skill_index.synced_at = latest or skill_index.synced_at or EPOCH
+    return skill_index
@@ -0,0 +1,262 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from app import db, metrics
+from app.models import Candidate, Skill
+from app.jobs.index import job_index
+from app.jobs.scores import refresh_candidate
+from app.nlp.cache import AnalysisCache
+from app.nlp.extraction import extraction_limits
+from app.nlp.index import serialize_vector
+from app.nlp.pipeline import analyze_cv_file, analysis_signature
+from app.nlp.preprocessing import KEYWORDS_VERSION
+from app.nlp.registry import warmup
+from app.nlp.vocabulary import skill_names
+from app.nlp.utils import file_digest
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): every process runs its own pool
+    fcntl = None
+
+# Candidate.analysis_status values
+PENDING = 'pending'
+PROCESSING = 'processing'
+DONE = 'done'
+FAILED = 'failed'
+
+def apply_analysis(candidate: Candidate, analysis: Dict[str, Any]):
+    """Stores the result of preprocess_cv on the candidate profile."""
+    candidate.skills = json.dumps(analysis.get('skills', []))
+    candidate.skill_tags = Skill.get_or_create(skill_names(analysis.get('skills', [])))
+    candidate.education = json.dumps(analysis.get('education', []))
+    candidate.keywords_version = KEYWORDS_VERSION
+    # Experience extraction is tricky, for now we might store entities or raw text
+    # The current NLP module doesn't have specific experience extraction logic beyond entities
+    candidate.experience = json.dumps(analysis.get('entities', {}))
+    # Persist the text representation used for matching so reads never re-extract the file
+    candidate.cleaned_text = analysis.get('cleaned_text', '')
+    candidate.text_vector = serialize_vector(job_index.term_counts([candidate.cleaned_text]))
+    # Recomputed from the new text the next time the candidate is scored
+    candidate.embedding = None
+    candidate.embedding_model = None
+    candidate.analysis_status = DONE
+    candidate.analyzed_at = datetime.utcnow()
+
+def get_analysis_cache(app) -> AnalysisCache:
+    cache = app.extensions.get('analysis_cache')
+    if cache is None:
+        cache = app.extensions['analysis_cache'] = AnalysisCache(
+            app.config['ANALYSIS_CACHE_FOLDER'],
+            app.config['ANALYSIS_CACHE_MAX_BYTES']
+        )
+    return cache
+
+def cached_analysis(app, file_path: str) -> Optional[Dict[str, Any]]:
+    """Analysis of an identical file analysed earlier with the same settings, if any."""
+    signature = analysis_signature(extraction_limits(app.config))
+    analysis = get_analysis_cache(app).get(file_digest(file_path), signature)
+    metrics.registry.increment('analysis_cache_hits' if analysis else 'analysis_cache_misses')
+    return analysis
+
+def cache_analysis(app, file_path: str, analysis: Dict[str, Any]):
+    signature = analysis_signature(extraction_limits(app.config))
+    get_analysis_cache(app).set(file_digest(file_path), signature, analysis)
+
+def analyze_cv_file_traced(file_path: str, limits: Optional[Dict[str, Any]],
+                           instrument: bool) -> Tuple[Optional[Dict[str, Any]], List[Any]]:
+    """
+    analyze_cv_file for the worker processes, also returning the stage
+    records so the web process can add them to its own metrics.
+    """
+    metrics.registry.enabled = instrument
+    with metrics.collect() as records:
+        analysis = analyze_cv_file(file_path, limits)
+    return analysis, records
+
+class IngestionQueue:
+    """
+    Background CV analysis on a process pool of a single web worker.
+
+    The queue itself is the database: a candidate waiting for analysis has
+    analysis_status = 'pending'. Every web worker runs a polling thread, but
+    only the one holding INGESTION_LOCK_FILE (an exclusive flock, released
+    when its process exits, e.g. when gunicorn recycles it) starts a pool
+    of INGESTION_WORKERS processes and takes pending rows, by switching them
+    to 'processing' with a conditional UPDATE, so that one row is only ever
+    analysed once even across hosts. The result is written back from the
+    pool's completion callback. Rows claimed more than
+    INGESTION_CLAIM_TIMEOUT seconds ago by a process that has since exited
+    are made pending again; recover does so for every row at startup.
+    """
+
+    def __init__(self):
+        self.executor = None
+        self.poller = None
+        self.lock_file = None
+        self.inflight = set()
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        @app.before_request
+        def start_polling():
+            if self.poller is None and app.config['INGESTION_ASYNC']:
+                self.start(app)
+
+    def start(self, app):
+        with self.lock:
+            if self.poller is not None:
+                return
+            if not app.extensions.get('ready'):
+                # Single-process server (flask run, run.py): nothing else recovered its rows
+                self.recover(app)
+            self.poller = threading.Thread(target=self._poll, args=(app,), name='ingestion-poll', daemon=True)
+            self.poller.start()
+
+    @property
+    def owner(self) -> bool:
+        return self.lock_file is not None
+
+    def _acquire(self, app) -> bool:
+        """Makes this process the one running the pool, if no other process of the host is."""
+        if self.owner:
+            return True
+        if fcntl is None:
+            self.lock_file = True
+            return True
+        lock_file = open(app.config['INGESTION_LOCK_FILE'], 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def _poll(self, app):
+        while True:
+            try:
+                if self._acquire(app):
+                    self.requeue_pending(app)
+            except Exception:
+                app.logger.exception("Error polling pending CV analyses")
+            time.sleep(app.config['INGESTION_POLL_INTERVAL'])
+
+    def _start(self, app):
+        with self.lock:
+            if self.executor is None:
+                # spawn: forking a threaded web server is unsafe
+                self.executor = ProcessPoolExecutor(
+                    max_workers=app.config['INGESTION_WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=warmup
+                )
+
+    def claim(self, candidate_id: int) -> bool:
+        """Takes a pending candidate for this process; False if another one already did."""
+        result = db.session.execute(
+            db.update(Candidate)
+            .where(Candidate.id == candidate_id, Candidate.analysis_status == PENDING)
+            .values(analysis_status=PROCESSING, analysis_claimed_at=datetime.utcnow())
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def submit(self, app, candidate_id: int, file_path: str):
+        """
+        Analyses a pending candidate right away in the process running the
+        pool; the other workers leave it to that process's next poll.
+        """
+        if not self.owner:
+            self.start(app)
+            return
+        if self.claim(candidate_id):
+            self._start(app)
+            self._submit(app, candidate_id, file_path)
+
+    def recover(self, app):
+        """
+        Makes the candidates left 'processing' by a previous run pending
+        again. Only called once per server start, before any worker takes rows.
+        """
+        with app.app_context():
+            result = db.session.execute(
+                db.update(Candidate).where(Candidate.analysis_status == PROCESSING)
+                .values(analysis_status=PENDING)
+            )
+            db.session.commit()
+            if result.rowcount:
+                app.logger.info("%d interrupted CV analysis(es) requeued", result.rowcount)
+
+    def requeue_pending(self, app):
+        """
+        Releases the stale claims, then submits the pending candidates this
+        process manages to claim, as many as the pool can start soon.
+        """
+        with app.app_context():
+            expired = datetime.utcnow() - timedelta(seconds=app.config['INGESTION_CLAIM_TIMEOUT'])
+            released = db.session.execute(
+                db.update(Candidate)
+                .where(Candidate.analysis_status == PROCESSING, Candidate.analysis_claimed_at < expired,
+                       ~Candidate.id.in_(list(self.inflight)))
+                .values(analysis_status=PENDING)
+            )
+            db.session.commit()
+            if released.rowcount:
+                app.logger.warning("%d stale CV analysis claim(s) released", released.rowcount)
+
+            capacity = app.config['INGESTION_WORKERS'] * 2 - len(self.inflight)
+            if capacity <= 0:
+                return
+            rows = db.session.query(Candidate.id, Candidate.cv_path) \
+                .filter(Candidate.analysis_status == PENDING).order_by(Candidate.id).limit(capacity).all()
+            for candidate_id, cv_path in rows:
+                file_path = os.path.join(app.config['UPLOAD_FOLDER'], cv_path or '')
+                if cv_path and os.path.exists(file_path):
+                    self.submit(app, candidate_id, file_path)
+                else:
+                    db.session.execute(db.update(Candidate).where(
+                        Candidate.id == candidate_id, Candidate.analysis_status == PENDING
+                    ).values(analysis_status=FAILED))
+                    db.session.commit()
+
+    def _submit(self, app, candidate_id: int, file_path: str):
+        self.inflight.add(candidate_id)
+        future = self.executor.submit(analyze_cv_file_traced, file_path, extraction_limits(app.config),
+                                      metrics.registry.enabled)
+        future.add_done_callback(lambda f: self._complete(app, candidate_id, file_path, f))
+
+    def _complete(self, app, candidate_id: int, file_path: str, future):
+        try:
+            self._store(app, candidate_id, file_path, future)
+        finally:
+            self.inflight.discard(candidate_id)
+
+    def _store(self, app, candidate_id: int, file_path: str, future):
+        with app.app_context():
+            candidate = db.session.get(Candidate, candidate_id)
+            # Ignore results for a CV that has since been replaced
+            if candidate is None or candidate.cv_path != os.path.basename(file_path):
+                return
+            try:
+                analysis, records = future.result()
+                metrics.merge(records)
+            except Exception:
+                app.logger.exception("Error analysing CV for candidate %s", candidate_id)
+                analysis = None
+            if analysis:
+                apply_analysis(candidate, analysis)
+                cache_analysis(app, file_path, analysis)
+            else:
+                candidate.analysis_status = FAILED
+            db.session.commit()
+            if analysis:
+                refresh_candidate(candidate)
+
+ingestion_queue = IngestionQueue()
@@ -1,14 +1,16 @@
 import os
-import json
-from flask import render_template, redirect, url_for, flash, request, current_app
+from flask import render_template, redirect, url_for, flash, request, current_app, jsonify
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
 from app import db
 from app.candidates import bp
 from app.candidates.forms import CVUploadForm
+from app.candidates.ingestion import ingestion_queue, apply_analysis, cached_analysis, cache_analysis, \
+    PENDING, FAILED
+from app.jobs.scores import refresh_candidate
 from app.models import Candidate
-from app.nlp.extraction import extract_text_from_pdf, extract_text_from_docx
-from app.nlp.preprocessing import preprocess_cv
+from app.nlp.extraction import extraction_limits
+from app.nlp.pipeline import analyze_cv_file
+from app.nlp.utils import save_uploaded_file
 
 @bp.route('/profile', methods=['GET', 'POST'])
 @login_required
@@ -26,41 +28,51 @@ def profile():
 
     form = CVUploadForm()
     if form.validate_on_submit():
-        f = form.cv.data
-        filename = secure_filename(f.filename)
-        
-        # Ensure upload directory exists
-        if not os.path.exists(current_app.config['UPLOAD_FOLDER']):
-            os.makedirs(current_app.config['UPLOAD_FOLDER'])
-            
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        f.save(filepath)
-        
-        # Extract text
-        text = ""
-        if filename.lower().endswith('.pdf'):
-            text = extract_text_from_pdf(filepath)
-        elif filename.lower().endswith('.docx'):
-            text = extract_text_from_docx(filepath)
-            
-        if text:
-            # Analyze CV
-            analysis = preprocess_cv(text)
-            
-            # Update Candidate Profile
-            candidate.cv_path = filename
-            candidate.skills = json.dumps(analysis.get('skills', []))
-            candidate.education = json.dumps(analysis.get('education', []))
-            # Experience extraction is tricky, for now we might store entities or raw text
-            # The current NLP module doesn't have specific experience extraction logic beyond entities
-            candidate.experience = json.dumps(analysis.get('entities', {})) 
-            
+        filepath = save_uploaded_file(form.cv.data, current_app.config['UPLOAD_FOLDER'])
+        candidate.cv_path = os.path.basename(filepath)
+
+        # A file identical to one already analysed is served from the cache
+        analysis = cached_analysis(current_app, filepath)
+        if analysis:
+            apply_analysis(candidate, analysis)
             db.session.commit()
+            refresh_candidate(candidate)
             flash('CV analysé avec succès !', 'success')
+            return redirect(url_for('candidates.profile'))
+
+        candidate.analysis_status = PENDING
+        db.session.commit()
+
+        if current_app.config['INGESTION_ASYNC']:
+            # Extraction and NLP run on the worker pool, the page polls for the result
+            ingestion_queue.submit(current_app._get_current_object(), candidate.id, filepath)
+            flash('CV reçu, analyse en cours...', 'info')
         else:
-            flash('Impossible d\'extraire le texte du fichier.', 'danger')
+            try:
+                analysis = analyze_cv_file(filepath, extraction_limits(current_app.config))
+            except Exception:
+                current_app.logger.exception("Error analysing CV for candidate %s", candidate.id)
+                analysis = None
+            if analysis:
+                apply_analysis(candidate, analysis)
+                cache_analysis(current_app, filepath, analysis)
+                flash('CV analysé avec succès !', 'success')
+            else:
+                candidate.analysis_status = FAILED
+                flash('Impossible d\'extraire le texte du fichier.', 'danger')
+            db.session.commit()
+            if analysis:
+                refresh_candidate(candidate)
             
         return redirect(url_for('candidates.profile'))
 
     return render_template('candidates/profile.html', form=form, candidate=candidate)
 
+
+@bp.route('/profile/status')
+@login_required
+def analysis_status():
+    candidate = current_user.candidate_profile
+    if current_user.role != 'candidate' or not candidate:
+        return jsonify({"status": None}), 404
+    return jsonify({"status": candidate.analysis_status})
@@ -0,0 +1,306 @@
+import hashlib
+import json
+import os
+import time
+import zipfile
+import click
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from datetime import datetime
+from flask import current_app
+from flask.cli import with_appcontext
+from app import db
+from app.models import User, Candidate, JobOffer, Skill, candidate_skill, job_skill
+from app.candidates.ingestion import apply_analysis, cached_analysis, cache_analysis
+from app.jobs.index import candidate_embeddings, get_embedder, get_vector_index, job_embeddings
+from app.jobs.scores import invalidate_scores
+from app.nlp.embeddings import deserialize_embeddings
+from app.nlp.extraction import allowed_file, extraction_limits
+from app.nlp.pipeline import analyze_cv_files, extract_keywords
+from app.nlp.preprocessing import KEYWORDS_VERSION
+from app.nlp.vocabulary import skill_names
+from app.nlp.registry import warmup
+
+def _iter_source_files(source):
+    """Yields (name, open_file) for every PDF/DOCX in a directory or zip archive."""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for member in archive.infolist():
+                if not member.is_dir() and allowed_file(member.filename):
+                    with archive.open(member) as f:
+                        yield member.filename, f
+    else:
+        for root, _, files in os.walk(source):
+            for filename in sorted(files):
+                if allowed_file(filename):
+                    with open(os.path.join(root, filename), 'rb') as f:
+                        yield os.path.join(root, filename), f
+
+# CVs an import could not analyse, {stored name: {"source", "error"}}, kept in the
+# upload folder so that later runs skip them unless --retry-failed is given
+FAILURES_FILE = 'import-failures.json'
+
+def _load_failures(upload_folder):
+    try:
+        with open(os.path.join(upload_folder, FAILURES_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_failures(upload_folder, failures):
+    path = os.path.join(upload_folder, FAILURES_FILE)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(failures, f, ensure_ascii=False, indent=1)
+    os.replace(f"{path}.tmp", path)
+
+def _stage_files(source, upload_folder, skipped):
+    """
+    Copies new CVs into the upload folder under a content-hash name and
+    returns {stored name: source name}. Files whose hash is in skipped
+    (already imported, or failed before) are not copied, which is what
+    makes an interrupted import resumable.
+    """
+    os.makedirs(upload_folder, exist_ok=True)
+    staged = {}
+    for name, f in _iter_source_files(source):
+        data = f.read()
+        extension = name.rsplit('.', 1)[1].lower()
+        stored_name = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        if stored_name in skipped or stored_name in staged:
+            continue
+        file_path = os.path.join(upload_folder, stored_name)
+        if not os.path.exists(file_path):
+            with open(file_path, 'wb') as out:
+                out.write(data)
+        staged[stored_name] = name
+    return staged
+
+def _candidate_names(analysis, source_name):
+    """First and last name from the PERSON entities, else from the file name."""
+    persons = analysis.get('entities', {}).get('PERSON') or []
+    parts = persons[0].split() if persons else []
+    if len(parts) < 2:
+        stem = os.path.splitext(os.path.basename(source_name))[0]
+        parts = stem.replace('_', ' ').replace('-', ' ').split() or ['Candidat']
+    first_name = parts[0]
+    last_name = ' '.join(parts[1:]) or '-'
+    return first_name[:50], last_name[:50]
+
+@click.command('import-cvs')
+@click.argument('source', type=click.Path(exists=True))
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True, help='Worker processes.')
+@click.option('--batch-size', default=32, show_default=True, help='CVs per worker task (nlp.pipe batch).')
+@click.option('--commit-every', default=200, show_default=True, help='Candidates per database commit.')
+@click.option('--ner-processes', default=1, show_default=True,
+              help='spaCy processes per worker (nlp.pipe n_process).')
+@click.option('--retry-failed', is_flag=True, help='Analyse again the CVs that failed in earlier runs.')
+@with_appcontext
+def import_cvs(source, workers, batch_size, commit_every, ner_processes, retry_failed):
+    """Bulk-imports the PDF/DOCX CVs of a directory or zip archive."""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    imported = {path for (path,) in db.session.query(Candidate.cv_path).filter(Candidate.cv_path.isnot(None))}
+    emails = {email.lower() for (email,) in db.session.query(User.email)}
+    failed_before = _load_failures(upload_folder)
+
+    staged = _stage_files(source, upload_folder, imported if retry_failed else imported | set(failed_before))
+    total = len(staged)
+    click.echo(f"{total} new CV(s) to import ({len(imported)} already imported, "
+               f"{0 if retry_failed else len(failed_before)} failed before).")
+    if not total:
+        return
+
+    app = current_app._get_current_object()
+    # Loaded before the pool starts so forked workers inherit the model
+    warmup()
+    done = failed = pending_commit = 0
+    failures = []
+    start = time.monotonic()
+
+    def add_candidate(stored_name, analysis):
+        # First address of the CV (emails are in document order) not taken yet
+        email = next((e for e in analysis.get('emails', []) if e.lower() not in emails), None)
+        if email is None:
+            email = f"cv-{stored_name[:16]}@import.local"
+        emails.add(email.lower())
+        first_name, last_name = _candidate_names(analysis, staged[stored_name])
+
+        user = User(email=email, role='candidate')
+        candidate = Candidate(user=user, first_name=first_name, last_name=last_name, cv_path=stored_name)
+        apply_analysis(candidate, analysis)
+        db.session.add(candidate)
+        failed_before.pop(stored_name, None)
+
+    def add_failure(stored_name, error):
+        failures.append((staged[stored_name], error))
+        failed_before[stored_name] = {"source": staged[stored_name], "error": str(error)}
+        # Not kept in the upload folder: only imported CVs belong there
+        try:
+            os.remove(os.path.join(upload_folder, stored_name))
+        except OSError:
+            pass
+
+    # Files already analysed elsewhere (e.g. uploaded through the site) skip the pool
+    to_analyze = []
+    for stored_name in staged:
+        analysis = cached_analysis(app, os.path.join(upload_folder, stored_name))
+        if analysis:
+            add_candidate(stored_name, analysis)
+            done += 1
+            pending_commit += 1
+        else:
+            to_analyze.append(stored_name)
+
+    chunks = [to_analyze[i:i + batch_size] for i in range(0, len(to_analyze), batch_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=warmup) as executor:
+        limits = extraction_limits(app.config)
+        futures = {executor.submit(analyze_cv_files, [os.path.join(upload_folder, name) for name in chunk],
+                                   batch_size, limits, ner_processes): chunk
+                   for chunk in chunks}
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                # A crashed worker fails its chunk, not the whole import
+                results = [(os.path.join(upload_folder, name), None, f"{type(e).__name__}: {e}")
+                           for name in futures[future]]
+            for file_path, analysis, error in results:
+                stored_name = os.path.basename(file_path)
+                if analysis is None:
+                    failed += 1
+                    add_failure(stored_name, error)
+                    continue
+                cache_analysis(app, file_path, analysis)
+                add_candidate(stored_name, analysis)
+                done += 1
+                pending_commit += 1
+
+            if pending_commit >= commit_every:
+                db.session.commit()
+                _save_failures(upload_folder, failed_before)
+                pending_commit = 0
+                elapsed = time.monotonic() - start
+                click.echo(f"{done + failed}/{total} processed, {failed} failed, "
+                           f"{(done + failed) / elapsed:.1f} CV/s")
+
+    db.session.commit()
+    _save_failures(upload_folder, failed_before)
+    elapsed = time.monotonic() - start
+    click.echo(f"Imported {done} CV(s), {failed} failed in {elapsed:.1f}s "
+               f"({(done + failed) / max(elapsed, 1e-9):.1f} CV/s).")
+    for name, error in failures:
+        click.echo(f"  failed: {name}: {error}", err=True)
+
+@click.command('build-embeddings')
+@click.option('--batch-size', default=256, show_default=True, help='Texts embedded per batch.')
+@with_appcontext
+def build_embeddings(batch_size):
+    """Embeds the offers and CVs without an up-to-date embedding and rebuilds the vector index."""
+    embedder = get_embedder()
+    if embedder is None:
+        click.echo("Embeddings are disabled: set SIMILARITY_BACKEND=embeddings and EMBEDDING_MODEL.", err=True)
+        return
+    start = time.monotonic()
+    for model, embed in ((JobOffer, job_embeddings), (Candidate, candidate_embeddings)):
+        stale = db.or_(model.embedding_model.is_(None), model.embedding_model != embedder.name)
+        done = 0
+        while True:
+            rows = model.query.filter(stale).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            embed(rows, embedder)
+            db.session.commit()
+            done += len(rows)
+        click.echo(f"{done} {model.__tablename__} row(s) embedded.")
+
+    index = get_vector_index()
+    rows = db.session.query(JobOffer.id, JobOffer.embedding).order_by(JobOffer.id).all()
+    if rows:
+        index.build([row.id for row in rows], deserialize_embeddings([row.embedding for row in rows],
+                                                                     embedder.dimension))
+    click.echo(f"Vector index of {len(index)} offer(s) built in {time.monotonic() - start:.1f}s.")
+
+def _stale_keywords(model):
+    return db.or_(model.keywords_version.is_(None), model.keywords_version != KEYWORDS_VERSION)
+
+def _store_keywords(model, association, owner_column: str, results):
+    """
+    Writes one chunk of re-extracted keywords in its own short transaction:
+    a bulk UPDATE of the rows still stale (a row re-analysed meanwhile is
+    left alone), the replacement of their skill associations and the
+    deletion of their match scores, computed from the old skills.
+    """
+    ids = [row_id for row_id, _, _ in results]
+    current = {row_id for (row_id,) in db.session.query(model.id).filter(model.id.in_(ids), _stale_keywords(model))}
+    results = [result for result in results if result[0] in current]
+    if not results:
+        db.session.rollback()
+        return 0
+
+    now = datetime.utcnow()
+    rows = [{"id": row_id, "skills": json.dumps(skills), "education": json.dumps(education),
+             "keywords_version": KEYWORDS_VERSION} for row_id, skills, education in results]
+    if model is Candidate:
+        # Moves the candidates into the next incremental sync of the skill index
+        for row in rows:
+            row["analyzed_at"] = now
+    db.session.execute(db.update(model), rows)
+
+    skills = {skill.name: skill for skill in Skill.get_or_create(
+        {name for _, row_skills, _ in results for name in skill_names(row_skills)})}
+    db.session.flush()
+    owner = association.c[owner_column]
+    db.session.execute(association.delete().where(owner.in_([row["id"] for row in rows])))
+    links = [{owner_column: row_id, "skill_id": skills[name].id}
+             for row_id, row_skills, _ in results for name in set(skill_names(row_skills))]
+    if links:
+        db.session.execute(association.insert(), links)
+    updated = [row["id"] for row in rows]
+    if model is Candidate:
+        invalidate_scores(candidate_ids=updated)
+    else:
+        invalidate_scores(job_ids=updated)
+    db.session.commit()
+    return len(rows)
+
+@click.command('reextract-skills')
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True, help='Worker processes.')
+@click.option('--chunk-size', default=500, show_default=True, help='Rows per worker task and per transaction.')
+@with_appcontext
+def reextract_skills(workers, chunk_size):
+    """Re-extracts skills and education of rows analysed with an older keyword dictionary."""
+    start = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for model, association, owner_column, text in (
+            (Candidate, candidate_skill, 'candidate_id', Candidate.cleaned_text),
+            (JobOffer, job_skill, 'job_id', JobOffer.description + ' ' + db.func.coalesce(JobOffer.requirements, ''))
+        ):
+            # Stored texts are read one chunk at a time, a few chunks ahead of the workers
+            stale = _stale_keywords(model)
+            if model is Candidate:
+                stale = db.and_(stale, Candidate.cleaned_text.isnot(None))
+            ids = [row_id for (row_id,) in db.session.query(model.id).filter(stale).order_by(model.id)]
+            db.session.rollback()
+            chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+            pending = set()
+            updated = 0
+
+            def submit(chunk):
+                rows = db.session.query(model.id, text).filter(model.id.in_(chunk)).all()
+                db.session.rollback()
+                return executor.submit(extract_keywords, [tuple(row) for row in rows], model is JobOffer)
+
+            while chunks or pending:
+                while chunks and len(pending) < workers * 2:
+                    pending.add(submit(chunks.pop(0)))
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    updated += _store_keywords(model, association, owner_column, future.result())
+                click.echo(f"{model.__tablename__}: {updated}/{len(ids)} updated "
+                           f"({updated / max(time.monotonic() - start, 1e-9):.0f} rows/s)")
+            click.echo(f"{model.__tablename__}: {updated} row(s) re-extracted with keywords {KEYWORDS_VERSION}.")
+    click.echo(f"Done in {time.monotonic() - start:.1f}s; the match scores of the updated rows "
+               f"are recomputed on their next view.")
+
+def register_commands(app):
+    app.cli.add_command(import_cvs)
+    app.cli.add_command(build_embeddings)
+    app.cli.add_command(reextract_skills)
@@ -0,0 +1,171 @@
+import os
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from flask import current_app
+from app import db
+from app.metrics import stage
+from app.models import Candidate, JobOffer
+from app.nlp.ann import VectorIndex
+from app.nlp.embeddings import Embedder, load_embedder, serialize_embedding, deserialize_embeddings
+from app.nlp.index import JobIndex, deserialize_vectors
+from app.nlp.matching import set_text_embedder
+
+job_index = JobIndex()
+
+def get_job_index() -> JobIndex:
+    """
+    Returns the process-wide job index, first appending any offer that was
+    published since the last sync (possibly by another worker).
+    """
+    latest_id = db.session.query(db.func.max(JobOffer.id)).scalar() or 0
+    if latest_id > job_index.last_id:
+        rows = db.session.query(JobOffer.id, JobOffer.description) \
+            .filter(JobOffer.id > job_index.last_id) \
+            .order_by(JobOffer.id).all()
+        job_index.add([row.id for row in rows], [row.description for row in rows])
+    return job_index
+
+def candidate_text_scores(job_id: int, text_vectors: Sequence[Optional[str]]) -> np.ndarray:
+    """
+    Text similarity between an offer and candidates, from the term counts
+    stored on each candidate (the CV files are never touched).
+    """
+    index = get_job_index()
+    job_vector = index.job_vector(job_id)
+    if job_vector is None or not text_vectors:
+        return np.zeros(len(text_vectors))
+    with stage('text_similarity', len(text_vectors)):
+        counts = deserialize_vectors(text_vectors, index.n_features)
+        scores = (index.weigh(counts) @ job_vector.T).toarray().ravel()
+    return np.clip(scores, 0.0, 1.0)
+
+def get_embedder() -> Optional[Embedder]:
+    """
+    The embedding model when SIMILARITY_BACKEND is 'embeddings', loaded once
+    per process; None means text similarity is TF-IDF.
+    """
+    if current_app.config['SIMILARITY_BACKEND'] != 'embeddings':
+        return None
+    if 'embedder' not in current_app.extensions:
+        try:
+            embedder = load_embedder(current_app.config['EMBEDDING_MODEL'])
+        except (ImportError, OSError, ValueError) as e:
+            current_app.logger.warning("Embedding model %r unavailable, text similarity falls back to TF-IDF: %s",
+                                       current_app.config['EMBEDDING_MODEL'], e)
+            embedder = None
+        # Pairwise similarities (calculate_similarity) use the same model
+        set_text_embedder(embedder)
+        current_app.extensions['embedder'] = embedder
+    return current_app.extensions['embedder']
+
+def text_backend() -> str:
+    """Name of the text similarity in use, part of the score version."""
+    embedder = get_embedder()
+    return embedder.name if embedder is not None else 'tfidf'
+
+def _embeddings(rows, texts: Sequence[str], embedder: Embedder, store: bool = True) -> np.ndarray:
+    """
+    Embeddings of candidates or offers, read from their embedding column;
+    rows without one for the current model are embedded in a single batch
+    and, with store, updated in the session, to be stored by the caller's
+    commit.
+    """
+    matrix = deserialize_embeddings([row.embedding if row.embedding_model == embedder.name else None
+                                     for row in rows], embedder.dimension)
+    stale = [i for i, row in enumerate(rows) if row.embedding_model != embedder.name or not row.embedding]
+    if stale:
+        with stage('embedding', len(stale)):
+            matrix[stale] = embedder.embed([texts[i] for i in stale])
+        if store:
+            for i in stale:
+                rows[i].embedding = serialize_embedding(matrix[i])
+                rows[i].embedding_model = embedder.name
+    return matrix
+
+def job_embeddings(jobs: Sequence[JobOffer], embedder: Embedder) -> np.ndarray:
+    return _embeddings(jobs, [job.description for job in jobs], embedder)
+
+def candidate_embeddings(candidates: Sequence[Candidate], embedder: Embedder) -> np.ndarray:
+    return _embeddings(candidates, [candidate.cleaned_text for candidate in candidates], embedder)
+
+def get_vector_index() -> Optional[VectorIndex]:
+    """
+    The on-disk nearest-neighbour index of offer embeddings, None unless
+    embeddings are enabled. Like get_job_index, it first picks up a newer
+    generation built by another worker and appends the offers published
+    since the last sync.
+    """
+    embedder = get_embedder()
+    if embedder is None:
+        return None
+    index = current_app.extensions.get('vector_index')
+    if index is None:
+        folder = current_app.config['EMBEDDING_INDEX_FOLDER']
+        os.makedirs(folder, exist_ok=True)
+        index = current_app.extensions['vector_index'] = VectorIndex(
+            folder, embedder.name, embedder.dimension, current_app.config['EMBEDDING_INDEX_PROBES'])
+    index.load()
+    latest_id = db.session.query(db.func.max(JobOffer.id)).scalar() or 0
+    if latest_id > index.last_id:
+        # Read only: an offer without a stored embedding is embedded in memory here, and
+        # stored when it is scored (its caller's commit) or by flask build-embeddings
+        rows = db.session.query(JobOffer.id, JobOffer.description, JobOffer.embedding, JobOffer.embedding_model) \
+            .filter(JobOffer.id > index.last_id).order_by(JobOffer.id).all()
+        vectors = _embeddings(rows, [row.description for row in rows], embedder, store=False)
+        index.add([row.id for row in rows], vectors)
+    return index
+
+def _tfidf_similarities(candidate: Candidate) -> Dict[int, float]:
+    """TF-IDF similarity between a CV and every offer, from its stored term counts if any."""
+    index = get_job_index()
+    if candidate.text_vector:
+        return index.similarities_from_counts(deserialize_vectors([candidate.text_vector], index.n_features))
+    return index.similarities(candidate.cleaned_text or "")
+
+def candidate_job_text_scores(candidate: Candidate, jobs: Sequence[JobOffer]) -> np.ndarray:
+    """Text similarity between a CV and offers, with the configured backend."""
+    embedder = get_embedder()
+    if embedder is not None:
+        cv_vector = candidate_embeddings([candidate], embedder)[0]
+        with stage('text_similarity', len(jobs)):
+            return np.clip(job_embeddings(jobs, embedder) @ cv_vector, 0.0, 1.0)
+    similarities = _tfidf_similarities(candidate)
+    return np.array([similarities.get(job.id, 0.0) for job in jobs])
+
+def job_candidate_text_scores(job: JobOffer, candidates: Sequence[Candidate]) -> np.ndarray:
+    """Text similarity between an offer and CVs, with the configured backend."""
+    embedder = get_embedder()
+    if embedder is not None:
+        job_vector = job_embeddings([job], embedder)[0]
+        with stage('text_similarity', len(candidates)):
+            return np.clip(candidate_embeddings(candidates, embedder) @ job_vector, 0.0, 1.0)
+    return candidate_text_scores(job.id, [candidate.text_vector for candidate in candidates])
+
+def text_job_scores(job: JobOffer, texts: Sequence[str]) -> np.ndarray:
+    """Text similarity between an offer and cleaned CV texts that are not stored (e.g. API input)."""
+    embedder = get_embedder()
+    if embedder is not None:
+        job_vector = job_embeddings([job], embedder)[0]
+        with stage('text_similarity', len(texts)):
+            return np.clip(embedder.embed(texts) @ job_vector, 0.0, 1.0)
+    index = get_job_index()
+    job_vector = index.job_vector(job.id)
+    if job_vector is None or not texts:
+        return np.zeros(len(texts))
+    with stage('text_similarity', len(texts)):
+        scores = (index.weigh(index.term_counts(texts)) @ job_vector.T).toarray().ravel()
+    return np.clip(scores, 0.0, 1.0)
+
+def nearest_jobs(candidate: Candidate, k: int) -> Optional[List[Tuple[int, float]]]:
+    """
+    (job id, text similarity) of the k offers closest to a CV, best first,
+    from an approximate query on the vector index that reads a fraction of
+    the catalogue. None without embeddings, or while the catalogue is small
+    enough (EMBEDDING_BRUTE_FORCE_MAX) for scoring every offer to be cheap.
+    """
+    index = get_vector_index()
+    if index is None or len(index) <= current_app.config['EMBEDDING_BRUTE_FORCE_MAX']:
+        return None
+    with stage('nearest_jobs', len(index)):
+        job_ids, scores = index.search(candidate_embeddings([candidate], get_embedder())[0], k)
+    return [(int(job_id), float(max(score, 0.0))) for job_id, score in zip(job_ids, scores)]
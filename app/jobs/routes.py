@@ -1,52 +1,56 @@
 import json
-from flask import render_template, redirect, url_for, flash, request
+from flask import render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.jobs import bp
 from app.jobs.forms import JobOfferForm
-from app.models import JobOffer, Company, Candidate
-from app.nlp.preprocessing import preprocess_job_description
-from app.nlp.matching import match_profile
+from app.jobs.index import get_job_index, get_vector_index
+from app.cache import cached_page
+from app.jobs.scores import (candidate_scores, job_scores, refresh_job_later, match_details, candidate_data, job_data,
+                             job_listing, catalogue_version, score_version)
+from app.candidates.index import get_skill_index
+from app.models import JobOffer, Company, Skill
+from app.nlp.preprocessing import preprocess_job_description, KEYWORDS_VERSION
+from app.nlp.vocabulary import skill_names
 
 @bp.route('/')
 def list_jobs():
-    jobs = JobOffer.query.order_by(JobOffer.created_at.desc()).all()
-    
-    # If candidate, calculate match scores
-    recommendations = []
+    # Rendered pages are cached per viewer and catalogue version, so publishing
+    # an offer or re-analysing a CV changes the key of the affected pages
+    catalogue = catalogue_version()
+
+    # If candidate, show the jobs ranked by their stored match scores
     if current_user.is_authenticated and current_user.role == 'candidate' and current_user.candidate_profile:
         candidate = current_user.candidate_profile
         if candidate.skills: # Only if candidate has a profile with skills
-            cv_data = {
-                "skills": candidate.get_skills_list(),
-                "education": candidate.get_education_list(),
-                "cleaned_text": "" # We might need to store cleaned text in DB or re-extract
-            }
-            # Note: We are missing the full text for text similarity if we don't store it.
-            # For now, we'll rely on skills and education.
-            
-            for job in jobs:
-                job_data = {
-                    "required_skills": job.get_skills_list(),
-                    "required_education": json.loads(job.education) if job.education else [],
-                    "cleaned_text": job.description # Use description as proxy
-                }
-                
-                # We need to handle the case where cleaned_text is missing for candidate
-                # For better results, we should store cleaned_text in Candidate model
-                # For now, let's assume 0 text similarity if missing
-                
-                match_result = match_profile(cv_data, job_data)
-                recommendations.append({
-                    "job": job,
-                    "score": match_result['total_score'],
-                    "details": match_result
-                })
-            
-            # Sort by score
-            recommendations.sort(key=lambda x: x['score'], reverse=True)
-            return render_template('jobs/recommendations.html', recommendations=recommendations)
+            return cached_page(('recommendations', candidate.id, candidate.analyzed_at, catalogue, score_version()),
+                               lambda: render_recommendations(candidate))
+
+    if not current_user.is_authenticated:
+        viewer = 'anonymous'
+    elif current_user.role == 'company':
+        viewer = ('company', current_user.company_profile.id if current_user.company_profile else None)
+    else:
+        viewer = current_user.role
+    return cached_page(('jobs', viewer, catalogue), render_job_list)
+
+def render_recommendations(candidate):
+    recommendations = []
+    scored = candidate_scores(candidate)
+    match_results = match_details(candidate_data(candidate, text=False),
+                                  [job_data(job, text=False) for job, _ in scored],
+                                  [score for _, score in scored], [job.company_id for job, _ in scored])
+    for (job, score), match_result in zip(scored, match_results):
+        recommendations.append({
+            "job": job,
+            "score": score.score,
+            "details": match_result
+        })
+    return render_template('jobs/recommendations.html', recommendations=recommendations)
 
+def render_job_list():
+    jobs = JobOffer.query.options(*job_listing()).populate_existing() \
+        .order_by(JobOffer.created_at.desc()).all()
     return render_template('jobs/list.html', jobs=jobs)
 
 @bp.route('/create', methods=['GET', 'POST'])
@@ -73,10 +77,15 @@ def create_job():
             requirements=form.requirements.data,
             company_id=current_user.company_profile.id,
             skills=json.dumps(analysis.get('required_skills', [])),
-            education=json.dumps(analysis.get('required_education', []))
+            education=json.dumps(analysis.get('required_education', [])),
+            keywords_version=KEYWORDS_VERSION,
+            skill_tags=Skill.get_or_create(skill_names(analysis.get('required_skills', [])))
         )
         db.session.add(job)
         db.session.commit()
+        get_job_index() # Sync the recommendation index with the new offer
+        get_vector_index()
+        refresh_job_later(job) # Only the new offer's scores are computed
         flash('Offre publiée avec succès !', 'success')
         return redirect(url_for('jobs.list_jobs'))
     
@@ -92,34 +101,27 @@ def job_candidates(job_id):
         flash('Accès non autorisé.', 'danger')
         return redirect(url_for('jobs.list_jobs'))
     
-    candidates = Candidate.query.all()
     recommendations = []
     
-    job_data = {
-        "required_skills": job.get_skills_list(),
-        "required_education": json.loads(job.education) if job.education else [],
-        "cleaned_text": job.description
-    }
-    
-    for candidate in candidates:
-        if candidate.skills:
-            cv_data = {
-                "skills": candidate.get_skills_list(),
-                "education": candidate.get_education_list(),
-                "cleaned_text": "" # Missing full text storage for candidate
-            }
-            
-            match_result = match_profile(cv_data, job_data)
-            recommendations.append({
-                "candidate": candidate,
-                "score": match_result['total_score'],
-                "details": match_result
-            })
+    # Candidates sharing no required skill are never scored nor listed: the
+    # inverted index yields the others without scanning every profile
+    source = job_data(job, text=False)
+    required_skills = skill_names(source['required_skills'])
+    candidate_ids = get_skill_index().overlap(required_skills)[0] if required_skills else None
     
-    # Sort by score
-    recommendations.sort(key=lambda x: x['score'], reverse=True)
+    # Only the requested page is read, from the stored scores
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config['CANDIDATES_PER_PAGE']
+    total, scored = job_scores(job, (page - 1) * per_page, per_page, candidate_ids)
+    match_results = match_details(source, [candidate_data(candidate, text=False) for candidate, _ in scored],
+                                  [score for _, score in scored], [job.company_id])
+    for (candidate, score), match_result in zip(scored, match_results):
+        recommendations.append({
+            "candidate": candidate,
+            "score": score.score,
+            "details": match_result
+        })
     
-    return render_template('jobs/candidates.html', job=job, recommendations=recommendations)
-
-
-
+    pages = (total + per_page - 1) // per_page
+    return render_template('jobs/candidates.html', job=job, recommendations=recommendations,
+                           page=page, pages=pages, total=total)
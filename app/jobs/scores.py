@@ -0,0 +1,360 @@
+import hashlib
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import db
+from app.metrics import stage, timed
+from app.models import Candidate, Company, JobOffer, MatchScore, candidate_skill, job_skill
+from app.jobs.index import (candidate_job_text_scores, get_embedder, job_candidate_text_scores, nearest_jobs,
+                            text_backend)
+from app.nlp.matching import MatchBatch, match_many
+from app.nlp.preprocessing import KEYWORDS_VERSION
+from app.nlp.scoring import ScoringPolicy
+
+# Stays below SQLite's limit on bound parameters
+ID_CHUNK_SIZE = 500
+# Characters of the description shown on listing cards
+SUMMARY_LENGTH = 150
+# Columns the stored scores of a row are computed from
+SCORED_COLUMNS = {
+    Candidate: ('skills', 'education', 'text_vector'),
+    JobOffer: ('skills', 'education', 'description')
+}
+
+def get_scoring_policy() -> ScoringPolicy:
+    """The scoring policy of the app, built once from its config."""
+    policy = current_app.extensions.get('scoring_policy')
+    if policy is None:
+        policy = current_app.extensions['scoring_policy'] = ScoringPolicy.from_config(current_app.config)
+    return policy
+
+def score_version() -> str:
+    """
+    Changes whenever the keyword dictionary, the scoring policy or the text
+    similarity backend change, which makes every stored score stale.
+
+    The scores of a single row are deleted whenever one of its
+    SCORED_COLUMNS changes: by _invalidate_changed_scores for ORM writes,
+    by invalidate_scores for bulk UPDATEs, which must call it.
+    """
+    key = f"{KEYWORDS_VERSION}:{get_scoring_policy().version}:{text_backend()}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+def catalogue_version() -> Tuple[int, int]:
+    """(count, latest id) of the offers: changes whenever an offer is published or removed."""
+    return tuple(db.session.query(db.func.count(JobOffer.id), db.func.max(JobOffer.id)).one())
+
+def candidate_data(candidate: Candidate, text: bool = True) -> Dict[str, Any]:
+    """Matching input of a candidate; text=False skips the (possibly unloaded) CV text."""
+    return {
+        "skills": candidate.get_skills_list(),
+        "education": candidate.get_education_list(),
+        "cleaned_text": (candidate.cleaned_text or "") if text else ""
+    }
+
+def job_data(job: JobOffer, text: bool = True) -> Dict[str, Any]:
+    """Matching input of an offer; text=False skips the (possibly unloaded) description."""
+    return {
+        "required_skills": job.get_skills_list(),
+        "required_education": job.get_education_list(),
+        "cleaned_text": job.description if text else ""
+    }
+
+def job_listing():
+    """
+    Loader options of listed offers: the columns the cards and match
+    details use, the start of the description and the company name, all
+    in the same query. Queries reusing already loaded offers need
+    populate_existing() for the summary to be set.
+    """
+    return (
+        db.load_only(JobOffer.id, JobOffer.title, JobOffer.company_id, JobOffer.skills, JobOffer.education,
+                     JobOffer.created_at),
+        db.with_expression(JobOffer.summary, db.func.substr(JobOffer.description, 1, SUMMARY_LENGTH)),
+        db.joinedload(JobOffer.company).load_only(Company.id, Company.name)
+    )
+
+def candidate_listing():
+    """Loader options of listed candidates: names and the columns the match details use."""
+    return (db.load_only(Candidate.id, Candidate.first_name, Candidate.last_name, Candidate.skills,
+                         Candidate.education),)
+
+def candidate_scoring():
+    """
+    Loader options of candidates scored against an offer: skills, education
+    and the stored vector of the text backend, never the CV text (only
+    read, lazily, to embed a CV that has no embedding yet).
+    """
+    if get_embedder() is None:
+        return (db.load_only(Candidate.id, Candidate.skills, Candidate.education, Candidate.text_vector),)
+    return (db.load_only(Candidate.id, Candidate.skills, Candidate.education, Candidate.embedding,
+                         Candidate.embedding_model),)
+
+def _chunks(ids: Sequence[int]):
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        yield ids[start:start + ID_CHUNK_SIZE]
+
+def _has_skills():
+    return db.and_(Candidate.skills.isnot(None), Candidate.skills != '')
+
+def _current(*criteria):
+    return db.and_(MatchScore.version == score_version(), *criteria)
+
+def _store(owner, column, ids: Sequence[int], batch: MatchBatch, text_scores: np.ndarray,
+           pairs: Sequence[Tuple[int, int]]):
+    """
+    Replaces the rows of the (candidate_id, job_id) pairs with the batch
+    scores; owner selects the row or column and column.in_(ids) the pairs.
+    """
+    totals = np.round(batch.total_scores(text_scores) * 100, 2)
+    version = score_version()
+    now = datetime.utcnow()
+    rows = [{
+        "candidate_id": candidate_id,
+        "job_id": job_id,
+        "score": float(totals[i]),
+        "skill_score": float(batch.skill_scores[i]),
+        "text_similarity": float(text_scores[i]),
+        "version": version,
+        "computed_at": now
+    } for i, (candidate_id, job_id) in enumerate(pairs)]
+    for chunk in _chunks(ids):
+        db.session.execute(db.delete(MatchScore).where(owner, column.in_(chunk)))
+    if rows:
+        db.session.execute(db.insert(MatchScore), rows)
+
+def invalidate_scores(candidate_ids: Sequence[int] = (), job_ids: Sequence[int] = (), session=None):
+    """
+    Deletes the stored scores of candidates and offers whose skills or text
+    changed, in the caller's transaction. They are recomputed on the next
+    view. Bulk UPDATEs of SCORED_COLUMNS must call it; ORM writes are
+    covered by _invalidate_changed_scores.
+    """
+    session = session or db.session
+    for column, ids in ((MatchScore.candidate_id, candidate_ids), (MatchScore.job_id, job_ids)):
+        for chunk in _chunks(list(ids)):
+            session.execute(db.delete(MatchScore).where(column.in_(chunk)))
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_changed_scores(session, flush_context):
+    # Scores computed from the previous skills or text would still carry the current score_version
+    changed = {Candidate: [], JobOffer: []}
+    for obj in session.dirty:
+        columns = SCORED_COLUMNS.get(type(obj))
+        if columns:
+            attrs = inspect(obj).attrs
+            if any(attrs[column].history.has_changes() for column in columns):
+                changed[type(obj)].append(obj.id)
+    if changed[Candidate] or changed[JobOffer]:
+        invalidate_scores(changed[Candidate], changed[JobOffer], session)
+
+def _commit():
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker stored the same pairs concurrently, its rows are as good
+        db.session.rollback()
+
+@timed('score_compute')
+def score_candidate(candidate: Candidate, jobs: Sequence[JobOffer]):
+    """Computes (part of) the row of a candidate: its scores against jobs."""
+    if not jobs:
+        return
+    policy = get_scoring_policy()
+    batch = MatchBatch(candidate_data(candidate, text=False), [job_data(job, text=False) for job in jobs],
+                       policy, policy.weights_for([job.company_id for job in jobs]))
+    text_scores = candidate_job_text_scores(candidate, jobs)
+    job_ids = [job.id for job in jobs]
+    _store(MatchScore.candidate_id == candidate.id, MatchScore.job_id, job_ids, batch, text_scores,
+           [(candidate.id, job_id) for job_id in job_ids])
+
+@timed('score_compute')
+def score_job(job: JobOffer, candidates: Sequence[Candidate]):
+    """Computes (part of) the column of an offer: its scores against candidates."""
+    if not candidates:
+        return
+    policy = get_scoring_policy()
+    batch = MatchBatch(job_data(job, text=False), [candidate_data(candidate, text=False) for candidate in candidates],
+                       policy, policy.weights_for([job.company_id]))
+    text_scores = job_candidate_text_scores(job, candidates)
+    candidate_ids = [candidate.id for candidate in candidates]
+    _store(MatchScore.job_id == job.id, MatchScore.candidate_id, candidate_ids, batch, text_scores,
+           [(candidate_id, job.id) for candidate_id in candidate_ids])
+
+def _job_shortlist(candidate: Candidate) -> Optional[List[int]]:
+    """
+    Ids of the offers worth scoring for a candidate: its nearest offers in
+    the vector index and those sharing one of its skills. None when every
+    offer is scored (TF-IDF, or a catalogue small enough, see nearest_jobs).
+    """
+    nearest = nearest_jobs(candidate, current_app.config['EMBEDDING_SHORTLIST'])
+    if nearest is None:
+        return None
+    skill_matched = db.session.query(job_skill.c.job_id) \
+        .join(candidate_skill, candidate_skill.c.skill_id == job_skill.c.skill_id) \
+        .filter(candidate_skill.c.candidate_id == candidate.id).distinct()
+    return sorted({job_id for job_id, _ in nearest} | {row.job_id for row in skill_matched})
+
+def _unscored_jobs(candidate: Candidate) -> List[JobOffer]:
+    """Offers of the candidate's shortlist without an up-to-date score."""
+    scored = db.session.query(MatchScore.job_id).filter(_current(MatchScore.candidate_id == candidate.id))
+    shortlist = _job_shortlist(candidate)
+    if shortlist is None:
+        return JobOffer.query.filter(~JobOffer.id.in_(scored)).all()
+    missing = []
+    for chunk in _chunks(shortlist):
+        missing.extend(JobOffer.query.filter(JobOffer.id.in_(chunk), ~JobOffer.id.in_(scored)))
+    return missing
+
+def refresh_candidate(candidate: Candidate):
+    """Recomputes the row of a candidate whose CV was (re)analysed."""
+    db.session.execute(db.delete(MatchScore).where(MatchScore.candidate_id == candidate.id))
+    if candidate.skills:
+        score_candidate(candidate, _unscored_jobs(candidate))
+    _commit()
+
+def _score_pool(job: JobOffer, query):
+    """
+    Scores the candidates selected by query against an offer, ID_CHUNK_SIZE
+    of them per query and per transaction, so that the pool is never loaded
+    at once.
+    """
+    last_id = 0
+    while True:
+        candidates = query.options(*candidate_scoring()).filter(Candidate.id > last_id) \
+            .order_by(Candidate.id).limit(ID_CHUNK_SIZE).all()
+        if not candidates:
+            return
+        score_job(job, candidates)
+        last_id = candidates[-1].id
+        _commit()
+
+def refresh_job(job: JobOffer):
+    """Computes the column of a newly published offer."""
+    _score_pool(job, Candidate.query.filter(_has_skills()))
+
+_refresh_executor = None
+_refresh_lock = threading.Lock()
+
+def _refresh_job_in_context(app, job_id: int):
+    with app.app_context():
+        try:
+            job = db.session.get(JobOffer, job_id)
+            if job is not None:
+                refresh_job(job)
+        except Exception:
+            app.logger.exception("Error scoring offer %s", job_id)
+
+def refresh_job_later(job: JobOffer):
+    """
+    Computes the column of a newly published offer on a background thread
+    when INGESTION_ASYNC is set, so that publishing does not wait for the
+    whole pool; the candidates page scores whatever is still missing.
+    """
+    global _refresh_executor
+    if not current_app.config['INGESTION_ASYNC']:
+        refresh_job(job)
+        return
+    with _refresh_lock:
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(max_workers=1)
+    _refresh_executor.submit(_refresh_job_in_context, current_app._get_current_object(), job.id)
+
+def candidate_scores(candidate: Candidate, limit: Optional[int] = None,
+                     company_id: Optional[int] = None) -> List[Tuple[JobOffer, MatchScore]]:
+    """
+    The scored offers (or the limit best, optionally of one company) with
+    their stored score for the candidate, best first. Offers of its
+    shortlist without an up-to-date score (e.g. after a version change)
+    are scored first: with a large catalogue, only the nearest offers and
+    those sharing a skill are (see _job_shortlist).
+    """
+    missing = _unscored_jobs(candidate)
+    if missing:
+        score_candidate(candidate, missing)
+        _commit()
+    with stage('score_query'):
+        query = db.session.query(JobOffer, MatchScore) \
+            .join(MatchScore, MatchScore.job_id == JobOffer.id) \
+            .options(*job_listing()).populate_existing() \
+            .filter(_current(MatchScore.candidate_id == candidate.id))
+        if company_id is not None:
+            query = query.filter(JobOffer.company_id == company_id)
+        return query.order_by(MatchScore.score.desc(), JobOffer.created_at.desc(), JobOffer.id.desc()) \
+            .limit(limit).all()
+
+def pair_scores(job: JobOffer, candidates: Sequence[Candidate]) -> List[MatchScore]:
+    """
+    Stored scores of an offer against the given candidates, in their order;
+    the pairs without an up-to-date score are computed in one batch first.
+    """
+    stored = {}
+    candidate_ids = [candidate.id for candidate in candidates]
+    for chunk in _chunks(candidate_ids):
+        stored.update((score.candidate_id, score) for score in
+                      MatchScore.query.filter(_current(MatchScore.job_id == job.id,
+                                                       MatchScore.candidate_id.in_(chunk))))
+    missing = [candidate for candidate in candidates if candidate.id not in stored]
+    if missing:
+        score_job(job, missing)
+        _commit()
+        for chunk in _chunks([candidate.id for candidate in missing]):
+            stored.update((score.candidate_id, score) for score in
+                          MatchScore.query.filter(_current(MatchScore.job_id == job.id,
+                                                           MatchScore.candidate_id.in_(chunk))))
+    return [stored[candidate_id] for candidate_id in candidate_ids]
+
+def job_scores(job: JobOffer, offset: int, limit: int,
+               candidate_ids: Optional[Sequence[int]] = None) -> Tuple[int, List[Tuple[Candidate, MatchScore]]]:
+    """
+    Returns (total, page) for the candidates of an offer, best first, from
+    an indexed ORDER BY score query. When candidate_ids is given (the
+    candidates sharing a required skill), only those are listed.
+    Candidates without an up-to-date score are scored first.
+    """
+    listed = _current(MatchScore.job_id == job.id)
+    if candidate_ids is not None:
+        # Rendered inline: the list can exceed SQLite's limit on bound parameters
+        candidate_ids = [int(candidate_id) for candidate_id in candidate_ids]
+        listed = db.and_(listed, MatchScore.candidate_id.in_(
+            db.bindparam('candidate_ids', candidate_ids, expanding=True, literal_execute=True)))
+        expected = len(candidate_ids)
+    else:
+        expected = Candidate.query.filter(_has_skills()).count()
+
+    total = db.session.query(db.func.count()).select_from(MatchScore).filter(listed).scalar()
+    if total < expected:
+        scored = db.session.query(MatchScore.candidate_id).filter(_current(MatchScore.job_id == job.id))
+        if candidate_ids is None:
+            _score_pool(job, Candidate.query.filter(_has_skills(), ~Candidate.id.in_(scored)))
+        else:
+            for chunk in _chunks(candidate_ids):
+                score_job(job, Candidate.query.options(*candidate_scoring())
+                          .filter(Candidate.id.in_(chunk), ~Candidate.id.in_(scored)).all())
+                _commit()
+        total = db.session.query(db.func.count()).select_from(MatchScore).filter(listed).scalar()
+
+    with stage('score_query'):
+        page = db.session.query(Candidate, MatchScore) \
+            .join(MatchScore, MatchScore.candidate_id == Candidate.id) \
+            .options(*candidate_listing()) \
+            .filter(listed) \
+            .order_by(MatchScore.score.desc(), Candidate.id) \
+            .offset(offset).limit(limit).all()
+    return total, page
+
+def match_details(source: Dict[str, Any], targets: Sequence[Dict[str, Any]],
+                  scores: Sequence[MatchScore], company_ids: Sequence[int]) -> List[Dict[str, Any]]:
+    """
+    Match results (matching and missing skills...) of the rendered rows
+    only, company_ids being the company of each offer (or of the one offer).
+    """
+    policy = get_scoring_policy()
+    return match_many(source, targets, [score.text_similarity for score in scores],
+                      policy, policy.weights_for(company_ids))
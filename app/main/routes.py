@@ -1,6 +1,43 @@
-from flask import render_template
+import hmac
+from flask import current_app, jsonify, render_template, request, Response, abort
+from app import db, metrics, serving
 from app.main import bp
 
 @bp.route('/')
 def index():
     return render_template('index.html')
+
+def _metrics_allowed() -> bool:
+    """With METRICS_TOKEN, scrapers send it as a Bearer token; without, only local clients are served."""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        header = request.headers.get('Authorization', '')
+        return hmac.compare_digest(header.encode('utf-8'), f"Bearer {token}".encode('utf-8'))
+    return request.remote_addr in ('127.0.0.1', '::1') and 'X-Forwarded-For' not in request.headers
+
+@bp.route('/metrics')
+def prometheus_metrics():
+    if not metrics.registry.enabled or not _metrics_allowed():
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/livez')
+def liveness():
+    """The process answers requests."""
+    return jsonify({"status": "ok"})
+
+@bp.route('/readyz')
+def readiness():
+    """
+    Models and indexes are loaded (see serving.warmup) and the database is
+    reachable. Only wsgi.py and python run.py call warmup: under flask run,
+    the models are loaded on first use and this stays 503.
+    """
+    if not serving.is_ready(current_app):
+        return jsonify({"status": "warming up"}), 503
+    try:
+        db.session.execute(db.text('SELECT 1'))
+    except Exception:
+        current_app.logger.exception("Readiness check failed")
+        return jsonify({"status": "database unavailable"}), 503
+    return jsonify({"status": "ready"})
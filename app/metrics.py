@@ -0,0 +1,319 @@
+import bisect
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from flask import g, request
+
+# Upper bounds (seconds) of the duration histogram buckets
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (stage, seconds, size) records of the request or task being traced
+_trace: contextvars.ContextVar = contextvars.ContextVar('metrics_trace', default=None)
+
+class _Histogram:
+    __slots__ = ('buckets', 'sum', 'count')
+
+    def __init__(self):
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.buckets[bisect.bisect_left(DURATION_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Registry:
+    """
+    In-process store of stage durations, input sizes and counters, rendered
+    in the Prometheus text format. Disabled registries record nothing and
+    stage() hands out a shared no-op context manager.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.durations: Dict[Tuple[str, str], _Histogram] = {}
+        self.sizes: Dict[str, float] = {}
+        self.errors: Dict[str, int] = {}
+        self.counters: Dict[str, float] = {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The recorded values as JSON-serializable data, see add."""
+        with self.lock:
+            return {
+                "durations": [[kind, key, histogram.buckets, histogram.sum, histogram.count]
+                              for (kind, key), histogram in self.durations.items()],
+                "sizes": dict(self.sizes),
+                "errors": dict(self.errors),
+                "counters": dict(self.counters)
+            }
+
+    def add(self, snapshot: Dict[str, Any]):
+        """Adds the values of another registry's snapshot to this one."""
+        with self.lock:
+            for kind, key, buckets, total, count in snapshot["durations"]:
+                histogram = self.durations.get((kind, key))
+                if histogram is None:
+                    histogram = self.durations[(kind, key)] = _Histogram()
+                histogram.buckets = [a + b for a, b in zip(histogram.buckets, buckets)]
+                histogram.sum += total
+                histogram.count += count
+            for field in ("sizes", "errors", "counters"):
+                values = getattr(self, field)
+                for key, value in snapshot[field].items():
+                    values[key] = values.get(key, 0) + value
+
+    def observe(self, stage: str, seconds: float, size: Optional[float] = None, error: bool = False,
+                kind: str = 'stage'):
+        with self.lock:
+            histogram = self.durations.get((kind, stage))
+            if histogram is None:
+                histogram = self.durations[(kind, stage)] = _Histogram()
+            histogram.observe(seconds)
+            if size is not None:
+                self.sizes[stage] = self.sizes.get(stage, 0) + size
+            if error:
+                self.errors[stage] = self.errors.get(stage, 0) + 1
+
+    def increment(self, name: str, amount: float = 1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for kind, label, help_text in (
+                ('stage', 'stage', 'Time spent in each pipeline stage.'),
+                ('request', 'endpoint', 'Time spent serving each endpoint.')
+            ):
+                name = f"cv_{kind}_duration_seconds"
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (histogram_kind, key), histogram in sorted(self.durations.items()):
+                    if histogram_kind != kind:
+                        continue
+                    cumulative = 0
+                    for bound, bucket in zip(DURATION_BUCKETS + (float('inf'),), histogram.buckets):
+                        cumulative += bucket
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f'{name}_bucket{{{label}="{key}",le="{le}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label}="{key}"}} {histogram.sum!r}')
+                    lines.append(f'{name}_count{{{label}="{key}"}} {histogram.count}')
+
+            lines += ["# HELP cv_stage_input_size_total Input processed by each stage (characters or items).",
+                      "# TYPE cv_stage_input_size_total counter"]
+            lines += [f'cv_stage_input_size_total{{stage="{stage}"}} {size!r}'
+                      for stage, size in sorted(self.sizes.items())]
+            lines += ["# HELP cv_stage_errors_total Stages that raised an exception.",
+                      "# TYPE cv_stage_errors_total counter"]
+            lines += [f'cv_stage_errors_total{{stage="{stage}"}} {count}'
+                      for stage, count in sorted(self.errors.items())]
+            for name, value in sorted(self.counters.items()):
+                lines += [f"# TYPE cv_{name}_total counter", f"cv_{name}_total {value!r}"]
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+class SharedStore:
+    """
+    Snapshots of the registry of every process of a server in one
+    directory (METRICS_MULTIPROC_DIR), so that /metrics reports the sum
+    over all gunicorn workers whichever one answers the scrape. A worker's
+    file is rewritten by a background thread within interval seconds of a
+    change; files of exited workers are kept so that counters never go
+    backwards.
+    """
+
+    def __init__(self, directory: str, interval: float = 1.0):
+        self.directory = directory
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.path = None
+        self.dirty = False
+        self.thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    def forked(self):
+        # A forked worker starts its own file and thread, the master's values stay in the master's
+        self.lock = threading.Lock()
+        self.path = None
+        self.dirty = False
+        self.thread = None
+
+    def touch(self):
+        """Marks this process's values as changed. Only called from workers, never before a fork."""
+        self.dirty = True
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+                    self.thread.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.interval)
+            if self.dirty:
+                self.dirty = False
+                self.write()
+
+    def write(self):
+        with self.lock:
+            if self.path is None:
+                self.path = os.path.join(self.directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(registry.snapshot(), f)
+            os.replace(tmp_path, self.path)
+
+    def collect(self) -> Registry:
+        """The sum of the snapshots of every process."""
+        merged = Registry()
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    merged.add(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return merged
+
+# Set by init_app when METRICS_MULTIPROC_DIR is configured
+shared_store: Optional[SharedStore] = None
+
+def _after_fork():
+    registry.reset()
+    if shared_store is not None:
+        shared_store.forked()
+
+def flush():
+    """Writes this process's snapshot for the other workers' /metrics."""
+    if shared_store is not None and registry.enabled:
+        shared_store.write()
+
+def render() -> str:
+    """The Prometheus page: this process's metrics, or the sum over the server's processes."""
+    if shared_store is None:
+        return registry.render()
+    shared_store.write()
+    return shared_store.collect().render()
+
+class _Stage:
+    __slots__ = ('name', 'size', 'start')
+
+    def __init__(self, name: str, size: Optional[float]):
+        self.name = name
+        self.size = size
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        registry.observe(self.name, seconds, self.size, exc_type is not None)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((self.name, seconds, self.size))
+        return False
+
+class _NullStage:
+    __slots__ = ('size',)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+def stage(name: str, size: Optional[float] = None):
+    """
+    Context manager timing one stage; size is the input size (characters,
+    items...) and can also be set on the returned object before the block
+    ends. Costs a single attribute check when metrics are disabled.
+    """
+    return _Stage(name, size) if registry.enabled else _NULL_STAGE
+
+def timed(name: str):
+    """Decorator timing every call of the function as a stage."""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return function(*args, **kwargs)
+            with _Stage(name, None):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def collect():
+    """Collects the (stage, seconds, size) records of the enclosed code."""
+    records: List[Tuple[str, float, Optional[float]]] = []
+    token = _trace.set(records)
+    try:
+        yield records
+    finally:
+        _trace.reset(token)
+
+def merge(records: Iterable[Tuple[str, float, Optional[float]]]):
+    """Adds records collected elsewhere (e.g. in a worker process)."""
+    if registry.enabled:
+        for name, seconds, size in records:
+            registry.observe(name, seconds, size)
+        if shared_store is not None:
+            shared_store.touch()
+
+def breakdown(records: Iterable[Tuple[str, float, Optional[float]]]) -> str:
+    """Total time per stage, slowest first, e.g. 'spacy_ner=1.204s(1) clean_text=0.010s(3)'."""
+    totals: Dict[str, List[float]] = {}
+    for name, seconds, _ in records:
+        total = totals.setdefault(name, [0.0, 0])
+        total[0] += seconds
+        total[1] += 1
+    return " ".join(f"{name}={seconds:.3f}s({count})"
+                    for name, (seconds, count) in sorted(totals.items(), key=lambda item: -item[1][0]))
+
+def init_app(app):
+    """Enables the registry from the config and traces every request."""
+    global shared_store
+    registry.enabled = app.config.get('METRICS_ENABLED', False)
+    if not registry.enabled:
+        return
+    if app.config.get('METRICS_MULTIPROC_DIR') and shared_store is None:
+        shared_store = SharedStore(app.config['METRICS_MULTIPROC_DIR'])
+        os.register_at_fork(after_in_child=_after_fork)
+    slow_seconds = app.config.get('SLOW_REQUEST_SECONDS')
+
+    @app.before_request
+    def start_trace():
+        g.metrics_records = []
+        _trace.set(g.metrics_records)
+        g.metrics_start = time.perf_counter()
+
+    @app.teardown_request
+    def end_trace(exc=None):
+        if 'metrics_start' not in g:
+            return
+        seconds = time.perf_counter() - g.metrics_start
+        _trace.set(None)
+        registry.observe(request.endpoint or 'unknown', seconds, kind='request')
+        if shared_store is not None:
+            shared_store.touch()
+        if slow_seconds and seconds > slow_seconds:
+            app.logger.warning("Slow request %s %s took %.3fs: %s", request.method, request.path, seconds,
+                               breakdown(g.metrics_records) or "no instrumented stage")
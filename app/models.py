@@ -1,17 +1,85 @@
 import json
 from datetime import datetime
+from functools import lru_cache
+from flask import current_app, has_app_context
 from flask_login import UserMixin
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db, login_manager
 
+# Normalized skill associations, kept in sync with the JSON skills columns
+candidate_skill = db.Table('candidate_skill',
+    db.Column('candidate_id', db.Integer, db.ForeignKey('candidate.id'), primary_key=True),
+    db.Column('skill_id', db.Integer, db.ForeignKey('skill.id'), primary_key=True, index=True)
+)
+
+job_skill = db.Table('job_skill',
+    db.Column('job_id', db.Integer, db.ForeignKey('job_offer.id'), primary_key=True),
+    db.Column('skill_id', db.Integer, db.ForeignKey('skill.id'), primary_key=True, index=True)
+)
+
+@lru_cache(maxsize=4096)
+def _decode(value):
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+def decode_json(value, default=None):
+    """
+    Decodes a JSON column, memoized on the raw text so listing pages don't
+    parse the same skills over and over. The result is shared between
+    callers and must not be mutated.
+    """
+    if not value:
+        return default
+    decoded = _decode(value)
+    return default if decoded is None else decoded
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    """
+    The logged-in user with their profile, in one joined query (the large
+    CV columns are only loaded if used). With USER_CACHE_TTL, the User row
+    is reused by the following requests of the process for that long; the
+    profile is not cached, so that changes made by other workers (analysis
+    status...) are seen at once, and is loaded on first access.
+    """
+    cache = current_app.extensions.get('user_cache')
+    values = cache.get(user_id) if cache is not None else None
+    if values is not None:
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    user = User.query.options(
+        db.joinedload(User.candidate_profile).defer(Candidate.cleaned_text).defer(Candidate.text_vector)
+        .defer(Candidate.embedding),
+        db.joinedload(User.company_profile).defer(Company.description)
+    ).filter(User.id == int(user_id)).first()
+    if user is not None and cache is not None:
+        cache.set(user_id, {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs})
+    return user
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_cached_users(session, flush_context):
+    # Other workers (and bulk updates) only see the change once the TTL expires
+    cache = current_app.extensions.get('user_cache') if has_app_context() else None
+    if cache is None:
+        return
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            cache.delete(str(inspect(obj).dict.get('id')))
+
+@lru_cache(maxsize=16)
+def _hash_prefix(method: str) -> str:
+    # Method and parameters as written in the hashes, werkzeug filling in its defaults
+    return generate_password_hash("", method=method, salt_length=1).split('$', 1)[0]
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256))
     role = db.Column(db.String(20), nullable=False) # 'company' or 'candidate'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -19,14 +87,24 @@ class User(UserMixin, db.Model):
     candidate_profile = db.relationship('Candidate', backref='user', uselist=False)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'],
+                                                    salt_length=current_app.config['PASSWORD_SALT_LENGTH'])
 
     def check_password(self, password):
+        # Accounts created by import-cvs have no password until one is set
+        if not self.password_hash:
+            return False
         return check_password_hash(self.password_hash, password)
 
+    def password_needs_rehash(self):
+        """Whether the hash was made with another method or cost than PASSWORD_HASH_METHOD."""
+        if not self.password_hash:
+            return False
+        return self.password_hash.split('$', 1)[0] != _hash_prefix(current_app.config['PASSWORD_HASH_METHOD'])
+
 class Company(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     website = db.Column(db.String(200))
@@ -34,55 +112,101 @@ class Company(db.Model):
 
 class Candidate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
     cv_path = db.Column(db.String(200))
     skills = db.Column(db.Text) # Stored as JSON string or comma-separated
     experience = db.Column(db.Text) # Stored as JSON string
     education = db.Column(db.Text) # Stored as JSON string
+    cleaned_text = db.Column(db.Text) # Cleaned CV text, kept so the file is never re-read
+    text_vector = db.Column(db.Text) # Hashed term counts of cleaned_text, stored as JSON
+    analysis_status = db.Column(db.String(20)) # pending, processing, done, failed
+    analysis_claimed_at = db.Column(db.DateTime) # When a process took it for analysis (processing)
+    analyzed_at = db.Column(db.DateTime, index=True) # Last time skills were (re)extracted
+    keywords_version = db.Column(db.String(12)) # Keyword dictionary the skills were extracted with
+    embedding = db.Column(db.LargeBinary) # Dense embedding of cleaned_text, float32 bytes
+    embedding_model = db.Column(db.String(200)) # Model the embedding was computed with
     applications = db.relationship('Application', backref='candidate', lazy=True)
+    skill_tags = db.relationship('Skill', secondary=candidate_skill, lazy=True)
+
+    __table_args__ = (
+        # Only the rows waiting for or under analysis are looked up by status; SQLite
+        # cannot match `= 'pending'` against an IN predicate, so it gets a full index
+        db.Index('ix_candidate_analysis_status', 'analysis_status',
+                 postgresql_where=db.text("analysis_status IN ('pending', 'processing')")),
+    )
 
     def get_skills_list(self):
-        if self.skills:
-            try:
-                return json.loads(self.skills)
-            except:
-                return []
-        return []
+        return decode_json(self.skills, [])
 
     def get_education_list(self):
-        if self.education:
-            try:
-                return json.loads(self.education)
-            except:
-                return []
-        return []
+        return decode_json(self.education, [])
 
 class JobOffer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False)
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False, index=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
     requirements = db.Column(db.Text)
     skills = db.Column(db.Text) # Stored as JSON string
     education = db.Column(db.Text) # Stored as JSON string
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    keywords_version = db.Column(db.String(12)) # Keyword dictionary the skills were extracted with
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    embedding = db.Column(db.LargeBinary) # Dense embedding of the description, float32 bytes
+    embedding_model = db.Column(db.String(200)) # Model the embedding was computed with
     applications = db.relationship('Application', backref='job', lazy=True)
+    skill_tags = db.relationship('Skill', secondary=job_skill, lazy=True)
+    # Start of the description, only loaded by listing queries (see with_summary)
+    summary = db.query_expression()
 
     def get_skills_list(self):
-        if self.skills:
-            try:
-                return json.loads(self.skills)
-            except:
-                return []
-        return []
+        return decode_json(self.skills, [])
+
+    def get_education_list(self):
+        return decode_json(self.education, [])
+
+class Skill(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+
+    @staticmethod
+    def get_or_create(names):
+        """Returns the Skill rows for names, adding the missing ones to the session."""
+        names = sorted(set(names))
+        if not names:
+            return []
+        skills = {skill.name: skill for skill in Skill.query.filter(Skill.name.in_(names))}
+        for name in names:
+            if name not in skills:
+                skills[name] = Skill(name=name)
+                db.session.add(skills[name])
+        return [skills[name] for name in names]
 
+class MatchScore(db.Model):
+    # Materialized score of a candidate against a job offer, see app/jobs/scores.py
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id'), primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('job_offer.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False) # Total score in percent, as displayed
+    skill_score = db.Column(db.Float, nullable=False)
+    text_similarity = db.Column(db.Float, nullable=False)
+    version = db.Column(db.String(16), nullable=False) # Scoring version the row was computed with
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_match_score_job_id_score', 'job_id', 'version', 'score'),
+        db.Index('ix_match_score_candidate_id_score', 'candidate_id', 'version', 'score'),
+    )
 
 class Application(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.Integer, db.ForeignKey('job_offer.id'), nullable=False)
-    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id'), nullable=False)
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id'), nullable=False, index=True)
     status = db.Column(db.String(20), default='pending') # pending, accepted, rejected
     score = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # One application per candidate and offer; also serves the lookups by job_id
+        db.UniqueConstraint('job_id', 'candidate_id', name='uq_application_job_id_candidate_id'),
+    )
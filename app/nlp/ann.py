@@ -0,0 +1,200 @@
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+# Rows assigned to their nearest centroid at a time while building
+ASSIGN_CHUNK_SIZE = 65536
+
+class VectorIndex:
+    """
+    Approximate nearest-neighbour index over L2-normalised vectors, stored
+    on disk as an inverted file (IVF).
+
+    Vectors are clustered around sqrt(n) centroids (spherical k-means) and
+    written grouped by cluster to a float32 file that is memory-mapped, so
+    a query only reads the rows of the `probes` clusters whose centroid is
+    closest: about probes * sqrt(n) dot products instead of n.
+
+    Rows added after a build are kept in memory and scanned exhaustively
+    until they reach `rebuild_ratio` of the index, which triggers a rebuild.
+    Each build goes to a new generation directory and the CURRENT file is
+    switched atomically, so other processes sharing the directory pick it up
+    on their next sync without ever reading a partial index.
+    """
+
+    def __init__(self, directory: str, model: str, dimension: int, probes: int = 8,
+                 rebuild_ratio: float = 0.1, min_rebuild: int = 256):
+        self.directory = directory
+        self.model = model
+        self.dimension = dimension
+        self.probes = probes
+        self.rebuild_ratio = rebuild_ratio
+        self.min_rebuild = min_rebuild
+        self.generation = None
+        self.modified = None
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        self.centroids = np.zeros((0, dimension), dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.pending_ids = []
+        self.pending_vectors = []
+        self.known = set()
+        self.last_id = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.pending_ids)
+
+    def _current_path(self) -> str:
+        return os.path.join(self.directory, 'CURRENT')
+
+    def load(self):
+        """Opens the latest generation on disk if it was built for this model."""
+        try:
+            # A stat per call, CURRENT is only read when another build switched it
+            modified = os.stat(self._current_path()).st_mtime_ns
+            if modified == self.modified:
+                return
+            self.modified = modified
+            with open(self._current_path(), 'r', encoding='utf-8') as f:
+                generation = f.read().strip()
+            path = os.path.join(self.directory, generation)
+            with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if generation == self.generation or meta.get('model') != self.model \
+                    or meta.get('dimension') != self.dimension:
+                return
+            ids = np.load(os.path.join(path, 'ids.npy'))
+            centroids = np.load(os.path.join(path, 'centroids.npy'))
+            offsets = np.load(os.path.join(path, 'offsets.npy'))
+            vectors = np.memmap(os.path.join(path, 'vectors.f32'), dtype=np.float32, mode='r',
+                                shape=(meta['count'], self.dimension)) if meta['count'] else \
+                np.zeros((0, self.dimension), dtype=np.float32)
+        except (OSError, ValueError, KeyError):
+            # Missing, or replaced by a newer generation while being read
+            return
+        with self.lock:
+            self.ids, self.centroids, self.offsets, self.vectors = ids, centroids, offsets, vectors
+            self.generation = generation
+            # Pending rows the new generation already covers are dropped
+            indexed = set(self.ids.tolist())
+            kept = [i for i, row_id in enumerate(self.pending_ids) if row_id not in indexed]
+            self.pending_ids = [self.pending_ids[i] for i in kept]
+            self.pending_vectors = [self.pending_vectors[i] for i in kept]
+            self.known = indexed | set(self.pending_ids)
+            self.last_id = max(self.known, default=0)
+
+    def add(self, ids: Sequence[int], vectors: np.ndarray):
+        """Adds rows, rebuilding the on-disk index once enough have accumulated."""
+        with self.lock:
+            for row_id, vector in zip(ids, vectors):
+                if row_id not in self.known:
+                    self.known.add(row_id)
+                    self.pending_ids.append(int(row_id))
+                    self.pending_vectors.append(np.asarray(vector, dtype=np.float32))
+                    self.last_id = max(self.last_id, int(row_id))
+            stale = len(self.pending_ids) >= max(self.min_rebuild, self.rebuild_ratio * len(self.ids))
+        if stale:
+            self.rebuild()
+
+    def rebuild(self):
+        """Clusters every row (on disk and pending) into a new generation."""
+        with self.lock:
+            if not self.pending_ids:
+                return
+            ids = np.concatenate([self.ids, np.array(self.pending_ids, dtype=np.int64)])
+            vectors = np.vstack([np.asarray(self.vectors), np.array(self.pending_vectors)])
+        self.build(ids, vectors)
+
+    def build(self, ids: Sequence[int], vectors: np.ndarray, seed: int = 0):
+        """Writes a new generation holding exactly these rows and switches to it."""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        centroids = _spherical_kmeans(vectors, max(1, int(np.sqrt(len(vectors)))), seed)
+        assignments = _assign(vectors, centroids)
+        order = np.argsort(assignments, kind='stable')
+        offsets = np.searchsorted(assignments[order], np.arange(len(centroids) + 1)).astype(np.int64)
+
+        generation = f"gen-{time.time_ns()}-{os.getpid()}"
+        path = os.path.join(self.directory, generation)
+        os.makedirs(path)
+        np.save(os.path.join(path, 'ids.npy'), ids[order])
+        np.save(os.path.join(path, 'centroids.npy'), centroids)
+        np.save(os.path.join(path, 'offsets.npy'), offsets)
+        vectors[order].tofile(os.path.join(path, 'vectors.f32'))
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({"model": self.model, "dimension": self.dimension, "count": len(ids)}, f)
+
+        tmp_path = f"{self._current_path()}.{generation}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(generation)
+        os.replace(tmp_path, self._current_path())
+        self.load()
+        self._remove_old_generations(generation)
+
+    def _remove_old_generations(self, current: str):
+        # Processes still mapping an old generation keep reading it until they
+        # reload; newer ones may be being written by another process
+        current_time = int(current.split('-')[1])
+        for name in os.listdir(self.directory):
+            if name.startswith('gen-') and name != current and int(name.split('-')[1]) < current_time:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def search(self, vector: np.ndarray, k: int, probes: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and cosine similarities of the (approximately) k nearest rows, best first."""
+        vector = np.asarray(vector, dtype=np.float32)
+        with self.lock:
+            candidate_ids, scores = [], []
+            if len(self.centroids):
+                probed = np.argsort(-(self.centroids @ vector))[:probes or self.probes]
+                for cluster in probed:
+                    start, end = self.offsets[cluster], self.offsets[cluster + 1]
+                    if end > start:
+                        candidate_ids.append(self.ids[start:end])
+                        scores.append(np.asarray(self.vectors[start:end]) @ vector)
+            if self.pending_ids:
+                candidate_ids.append(np.array(self.pending_ids, dtype=np.int64))
+                scores.append(np.array(self.pending_vectors) @ vector)
+        if not candidate_ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        candidate_ids, scores = np.concatenate(candidate_ids), np.concatenate(scores)
+        if k < len(scores):
+            top = np.argpartition(-scores, k)[:k]
+            candidate_ids, scores = candidate_ids[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return candidate_ids[order], scores[order]
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignments = np.zeros(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_CHUNK_SIZE):
+        chunk = vectors[start:start + ASSIGN_CHUNK_SIZE]
+        assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+def _spherical_kmeans(vectors: np.ndarray, n_clusters: int, seed: int, iterations: int = 10) -> np.ndarray:
+    """Centroids (unit norm) of a k-means on cosine similarity, fit on a sample of the rows."""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(vectors))
+    if n_clusters <= 1:
+        centroid = vectors.sum(axis=0, keepdims=True) if len(vectors) else np.zeros((1, vectors.shape[1]))
+        return _normalize(centroid.astype(np.float32))
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), 256 * n_clusters), replace=False)]
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        # Empty clusters are reseeded on random rows
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
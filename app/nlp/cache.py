@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+class AnalysisCache:
+    """
+    Content-addressed cache of CV analyses on local disk.
+
+    Entries are JSON files named after the hash of the CV bytes combined with
+    a signature of everything that influences the analysis (keyword
+    dictionary, spaCy model, extraction limits), so a dictionary or model
+    change never serves stale results. Reading an entry refreshes its mtime,
+    and the least recently used entries are deleted once the cache grows
+    past max_bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = None
+        self.lock = threading.Lock()
+
+    def _path(self, digest: str, signature: str) -> str:
+        return os.path.join(self.directory, signature, digest[:2], f"{digest}.json")
+
+    def get(self, digest: str, signature: str) -> Optional[Dict[str, Any]]:
+        path = self._path(digest, signature)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                analysis = json.load(f)
+            os.utime(path)
+            return analysis
+        except (OSError, ValueError):
+            return None
+
+    def set(self, digest: str, signature: str, analysis: Dict[str, Any]):
+        path = self._path(digest, signature)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(analysis, f)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            if self.size is None:
+                self.size = self._disk_usage()
+            else:
+                self.size += os.path.getsize(path)
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                if filename.endswith('.json'):
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Deletes least recently used entries down to 90% of the budget."""
+        entries = sorted(self._entries())
+        self.size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if self.size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
@@ -0,0 +1,89 @@
+import threading
+import numpy as np
+from typing import Optional, Sequence
+
+class Embedder:
+    """
+    Dense text embeddings computed locally on CPU. Rows are L2-normalised,
+    so the cosine similarity of two texts is the dot product of their rows.
+    name identifies the model: stored embeddings are only reused when it
+    matches.
+    """
+
+    name = ""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._dimension = 0
+
+    def _encode(self, texts: Sequence[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    @property
+    def dimension(self) -> int:
+        if not self._dimension:
+            self._dimension = self.embed(["dimension"]).shape[1]
+        return self._dimension
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """(n x dimension) float32 matrix, zero rows for empty texts."""
+        with self.lock:
+            vectors = np.asarray(self._encode([text or "" for text in texts]), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+class SentenceTransformerEmbedder(Embedder):
+    """A sentence-transformers model read from a local directory (never downloaded)."""
+
+    def __init__(self, path: str, batch_size: int = 32):
+        super().__init__()
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(path, device='cpu', local_files_only=True)
+        self.batch_size = batch_size
+        self.name = f"sentence-transformers:{path}"
+
+    def _encode(self, texts: Sequence[str]) -> np.ndarray:
+        return self.model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True)
+
+class SpacyVectorEmbedder(Embedder):
+    """Average of the static word vectors of a spaCy model (e.g. fr_core_news_md)."""
+
+    def __init__(self, model: str):
+        super().__init__()
+        import spacy
+
+        self.nlp = spacy.load(model, exclude=["tagger", "morphologizer", "parser", "senter", "ner",
+                                              "attribute_ruler", "lemmatizer"])
+        if not self.nlp.vocab.vectors.shape[0]:
+            raise ValueError(f"spaCy model {model} has no word vectors")
+        self.name = f"spacy:{model}-{self.nlp.meta.get('version', '')}"
+
+    def _encode(self, texts: Sequence[str]) -> np.ndarray:
+        return np.array([doc.vector for doc in self.nlp.pipe(texts)])
+
+def load_embedder(spec: str) -> Embedder:
+    """
+    Loads the embedding model described by spec, either
+    'sentence-transformers:<local directory>' or 'spacy:<model name>'.
+    Raises ValueError for another spec, ImportError or OSError when the
+    model or its library is not installed.
+    """
+    kind, _, target = (spec or "").partition(':')
+    if kind == 'sentence-transformers' and target:
+        return SentenceTransformerEmbedder(target)
+    if kind == 'spacy' and target:
+        return SpacyVectorEmbedder(target)
+    raise ValueError(f"Unknown embedding model '{spec}'")
+
+def serialize_embedding(vector: np.ndarray) -> bytes:
+    """Stores one embedding as little-endian float32 bytes."""
+    return np.asarray(vector, dtype='<f4').tobytes()
+
+def deserialize_embeddings(values: Sequence[Optional[bytes]], dimension: int) -> np.ndarray:
+    """Rebuilds an embedding matrix from stored rows (missing or malformed rows stay zero)."""
+    matrix = np.zeros((len(values), dimension), dtype=np.float32)
+    for i, value in enumerate(values):
+        if value and len(value) == dimension * 4:
+            matrix[i] = np.frombuffer(value, dtype='<f4')
+    return matrix
@@ -1,46 +1,112 @@
+import logging
 import pdfplumber
 import docx
 import os
+import time
+from typing import Any, Dict, Iterator, Optional
+from app.metrics import stage
+
+logger = logging.getLogger(__name__)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'pdf', 'docx'}
 
-def extract_text_from_pdf(file_path) -> str:
-    """Extracts text from a PDF file using pdfplumber."""
-    text = ""
-    try:
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
+def extraction_limits(config) -> Dict[str, Any]:
+    """Reads the extraction budget from the Flask config."""
+    return {
+        "max_pages": config.get('EXTRACTION_MAX_PAGES'),
+        "max_chars": config.get('EXTRACTION_MAX_CHARS'),
+        "timeout": config.get('EXTRACTION_TIMEOUT')
+    }
+
+class _Budget:
+    """Tracks the character and time budget of one extraction."""
+
+    def __init__(self, max_chars: Optional[int], timeout: Optional[float]):
+        self.remaining = max_chars
+        self.deadline = time.monotonic() + timeout if timeout else None
+
+    def expired(self) -> bool:
+        return (self.remaining is not None and self.remaining <= 0) or \
+            (self.deadline is not None and time.monotonic() > self.deadline)
+
+    def take(self, text: str) -> str:
+        if self.remaining is not None:
+            text = text[:self.remaining]
+            self.remaining -= len(text)
+        return text
+
+def iter_pdf_pages(file_path, max_pages: Optional[int] = None, max_chars: Optional[int] = None,
+                   timeout: Optional[float] = None) -> Iterator[str]:
+    """
+    Yields the text of a PDF one page at a time using pdfplumber.
+    Stops after max_pages pages or max_chars characters, or once timeout
+    seconds have elapsed (checked between pages). Each page's layout cache
+    is released as soon as its text is read, so memory stays bounded.
+    A file that cannot be read, even partway through, raises rather than
+    ending the iteration early with partial text.
+    """
+    budget = _Budget(max_chars, timeout)
+    pages = range(1, max_pages + 1) if max_pages else None
+    with pdfplumber.open(file_path, pages=pages) as pdf:
+        for page in pdf.pages:
+            if budget.expired():
+                break
+            with stage('extract_pdf_page') as timer:
                 page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-    except Exception as e:
-        print(f"Error reading PDF: {e}")
+                timer.size = len(page_text or "")
+            page.close()
+            if page_text:
+                yield budget.take(page_text + "\n")
+
+def iter_docx_paragraphs(file_path, max_pages: Optional[int] = None, max_chars: Optional[int] = None,
+                         timeout: Optional[float] = None) -> Iterator[str]:
+    """
+    Yields the text of a DOCX one paragraph at a time, with the same budget
+    as PDFs (DOCX files have no pages, so max_pages is ignored). Raises
+    when the file cannot be read.
+    """
+    budget = _Budget(max_chars, timeout)
+    with stage('extract_docx_open'):
+        doc = docx.Document(file_path)
+    for para in doc.paragraphs:
+        if budget.expired():
+            break
+        yield budget.take(para.text + "\n")
+
+def extract_text_from_pdf(file_path, **limits) -> str:
+    """Extracts text from a PDF file using pdfplumber, "" if it cannot be read."""
+    try:
+        return "".join(iter_pdf_pages(file_path, **limits))
+    except Exception:
+        logger.exception("Error reading PDF %s", file_path)
         return ""
-    return text
 
-def extract_text_from_docx(file_path) -> str:
-    """Extracts text from a DOCX file using python-docx."""
-    text = ""
+def extract_text_from_docx(file_path, **limits) -> str:
+    """Extracts text from a DOCX file using python-docx, "" if it cannot be read."""
     try:
-        doc = docx.Document(file_path)
-        for para in doc.paragraphs:
-            text += para.text + "\n"
-    except Exception as e:
-        print(f"Error reading DOCX: {e}")
+        return "".join(iter_docx_paragraphs(file_path, **limits))
+    except Exception:
+        logger.exception("Error reading DOCX %s", file_path)
         return ""
-    return text
 
-def extract_content(file_path: str) -> str:
+def iter_content(file_path: str, **limits) -> Iterator[str]:
     """
-    Determines file type and extracts text.
+    Determines file type and yields its text page by page (or paragraph by
+    paragraph), see iter_pdf_pages for the limits.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
 
     if file_path.lower().endswith('.pdf'):
-        return extract_text_from_pdf(file_path)
+        return iter_pdf_pages(file_path, **limits)
     elif file_path.lower().endswith('.docx'):
-        return extract_text_from_docx(file_path)
+        return iter_docx_paragraphs(file_path, **limits)
     else:
         raise ValueError("Unsupported file format. Please upload PDF or DOCX.")
+
+def extract_content(file_path: str, **limits) -> str:
+    """
+    Determines file type and extracts text.
+    """
+    return "".join(iter_content(file_path, **limits))
@@ -0,0 +1,111 @@
+import json
+import threading
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from typing import Dict, Iterable, List, Optional, Sequence
+
+class JobIndex:
+    """
+    Corpus-level TF-IDF index over job offer texts.
+
+    Texts are tokenised once with a HashingVectorizer, so new offers can be
+    appended without refitting a vocabulary; only the IDF weights are refit
+    from the stored term counts, which is a cheap sparse operation.
+    """
+
+    def __init__(self, n_features: int = 2 ** 18):
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            stop_words='english',
+            alternate_sign=False,
+            norm=None
+        )
+        self.transformer = TfidfTransformer()
+        self.n_features = n_features
+        self.job_ids: List[int] = []
+        self.positions: Dict[int, int] = {}
+        self.counts = sp.csr_matrix((0, n_features))
+        self.matrix = sp.csr_matrix((0, n_features))
+        self.last_id = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.job_ids)
+
+    def add(self, job_ids: Iterable[int], texts: Iterable[str]):
+        """Appends offers to the index and refreshes the IDF weights."""
+        with self.lock:
+            pairs = [(job_id, text) for job_id, text in zip(job_ids, texts)
+                     if job_id not in self.positions]
+            if not pairs:
+                return
+            new_counts = self.vectorizer.transform([text or "" for _, text in pairs])
+            for job_id, _ in pairs:
+                self.positions[job_id] = len(self.job_ids)
+                self.job_ids.append(job_id)
+                self.last_id = max(self.last_id, job_id)
+            self.counts = sp.vstack([self.counts, new_counts], format='csr')
+            # TfidfTransformer L2-normalises rows, so a dot product is a cosine
+            self.matrix = self.transformer.fit_transform(self.counts).tocsr()
+
+    def term_counts(self, texts: Sequence[str]) -> sp.csr_matrix:
+        """
+        Raw hashed term counts. They do not depend on the corpus, so they can
+        be stored with a CV and weighted later with the current IDF.
+        """
+        return self.vectorizer.transform([text or "" for text in texts]).tocsr()
+
+    def weigh(self, counts: sp.csr_matrix) -> sp.csr_matrix:
+        """Applies the corpus IDF and L2 normalisation to raw term counts."""
+        with self.lock:
+            return self.transformer.transform(counts).tocsr()
+
+    def job_vector(self, job_id: int) -> Optional[sp.csr_matrix]:
+        with self.lock:
+            position = self.positions.get(job_id)
+            return None if position is None else self.matrix[position]
+
+    def similarities(self, text: str) -> Dict[int, float]:
+        """
+        Cosine similarity between a text and every indexed offer,
+        computed as a single sparse matrix-vector product.
+        """
+        if not text:
+            return {}
+        return self.similarities_from_counts(self.term_counts([text]))
+
+    def similarities_from_counts(self, counts: sp.csr_matrix) -> Dict[int, float]:
+        """Same as similarities, from precomputed term counts (e.g. stored with a CV)."""
+        if counts.nnz == 0:
+            return {}
+        with self.lock:
+            if not self.job_ids:
+                return {}
+            vector = self.transformer.transform(counts)
+            scores = (self.matrix @ vector.T).toarray().ravel()
+            job_ids = list(self.job_ids)
+        return dict(zip(job_ids, np.clip(scores, 0.0, 1.0).tolist()))
+
+def serialize_vector(counts: sp.csr_matrix) -> str:
+    """Serialises a single row of term counts as JSON for storage."""
+    return json.dumps({
+        "indices": counts.indices.tolist(),
+        "counts": counts.data.astype(int).tolist()
+    })
+
+def deserialize_vectors(values: Sequence[Optional[str]], n_features: int) -> sp.csr_matrix:
+    """Rebuilds a term count matrix from serialised rows (missing rows stay empty)."""
+    indptr = [0]
+    indices = []
+    data = []
+    for value in values:
+        if value:
+            try:
+                vector = json.loads(value)
+                indices.extend(vector["indices"])
+                data.extend(vector["counts"])
+            except (ValueError, KeyError):
+                pass
+        indptr.append(len(indices))
+    return sp.csr_matrix((data, indices, indptr), shape=(len(values), n_features))
@@ -0,0 +1,88 @@
+import re
+from typing import Dict, Iterable, List, Set
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Builds a regex alternation structured as a prefix trie, e.g.
+    ['java', 'javascript', 'jira'] -> 'j(?:ava(?:script)?|ira)'.
+    The regex engine then walks the trie once per position instead of
+    trying every keyword, and optional suffixes are tried longest first.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+
+    return build(trie)
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+def _is_boundary(text: str, position: int) -> bool:
+    """Same test as the regex \\b at position."""
+    before = position > 0 and _is_word_char(text[position - 1])
+    after = position < len(text) and _is_word_char(text[position])
+    return before != after
+
+class KeywordMatcher:
+    """
+    Finds every whole-word occurrence of a keyword list in a single pass.
+
+    Equivalent to running re.search(r'\\b' + re.escape(keyword) + r'\\b', text)
+    for each keyword, but the whole list is compiled once into one trie-shaped
+    regex. A lookahead lets matches overlap, so 'adobe xd' and 'xd' are both
+    found, and keywords that are prefixes of a longer hit at the same position
+    are checked with a cheap boundary test.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = sorted(set(keyword for keyword in keywords if keyword))
+        self.pattern = None
+        if self.keywords:
+            self.pattern = re.compile(r'(?=\b(' + _trie_pattern(self.keywords) + r')\b)')
+        keyword_set = set(self.keywords)
+        # Shorter keywords that can also match where a longer one starts
+        self.prefixes: Dict[str, List[str]] = {
+            keyword: [keyword[:i] for i in range(1, len(keyword)) if keyword[:i] in keyword_set]
+            for keyword in self.keywords
+        }
+
+    def find(self, text: str) -> Set[str]:
+        """Returns the set of keywords present as whole words in text."""
+        found = set()
+        if self.pattern is None:
+            return found
+        for match in self.pattern.finditer(text):
+            keyword = match.group(1)
+            found.add(keyword)
+            start = match.start()
+            for prefix in self.prefixes[keyword]:
+                if prefix not in found and _is_boundary(text, start + len(prefix)):
+                    found.add(prefix)
+        return found
+
+class CategoryMatcher:
+    """KeywordMatcher over a {category: [keywords]} dictionary."""
+
+    def __init__(self, categories: Dict[str, List[str]]):
+        self.categories = categories
+        self.matcher = KeywordMatcher(keyword for keywords in categories.values() for keyword in keywords)
+
+    def find(self, text: str, default_categories: Iterable[str] = ()) -> Dict[str, List[str]]:
+        """Returns found keywords per category, in dictionary order."""
+        found = self.matcher.find(text)
+        result = {category: [] for category in default_categories}
+        for category, keywords in self.categories.items():
+            result.setdefault(category, []).extend(keyword for keyword in keywords if keyword in found)
+        return result
@@ -1,13 +1,37 @@
+import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence
+from app.nlp.preprocessing import KEYWORDS, EDUCATION_KEYWORDS
+from app.metrics import stage
+from app.nlp.scoring import DEFAULT_POLICY, ScoringPolicy
+from app.nlp.vocabulary import Vocabulary, packed_width, popcount, skill_names, widen
+
+SKILL_VOCABULARY = Vocabulary(skill for skills in KEYWORDS.values() for skill in skills)
+EDUCATION_VOCABULARY = Vocabulary(EDUCATION_KEYWORDS)
+
+# Dense embedding model replacing TF-IDF for text similarity, see set_text_embedder
+_text_embedder = None
+
+def set_text_embedder(embedder):
+    """
+    Makes calculate_similarity/calculate_similarities use the cosine of
+    dense embeddings (an app.nlp.embeddings.Embedder), or TF-IDF again
+    when None.
+    """
+    global _text_embedder
+    _text_embedder = embedder
 
 def calculate_similarity(text1: str, text2: str) -> float:
     """
-    Calculates cosine similarity between two texts using TF-IDF.
+    Calculates cosine similarity between two texts using TF-IDF (or the
+    text embedder, when one is set).
     """
     if not text1 or not text2:
         return 0.0
+    if _text_embedder is not None:
+        vectors = _text_embedder.embed([text1, text2])
+        return float(np.clip(vectors[0] @ vectors[1], 0.0, 1.0))
         
     vectorizer = TfidfVectorizer(stop_words='english') # Should ideally use French stop words if content is French
     try:
@@ -17,6 +41,27 @@ def calculate_similarity(text1: str, text2: str) -> float:
     except ValueError:
         return 0.0
 
+def calculate_similarities(text: str, texts: Sequence[str]) -> np.ndarray:
+    """
+    Cosine similarity between one text and many, with a single TF-IDF fit
+    over the whole batch (or a single embedding batch).
+    """
+    scores = np.zeros(len(texts))
+    positions = [i for i, other in enumerate(texts) if other]
+    if not text or not positions:
+        return scores
+    if _text_embedder is not None:
+        vectors = _text_embedder.embed([text] + [texts[i] for i in positions])
+        scores[positions] = np.clip(vectors[1:] @ vectors[0], 0.0, 1.0)
+        return scores
+    vectorizer = TfidfVectorizer(stop_words='english')
+    try:
+        tfidf_matrix = vectorizer.fit_transform([text] + [texts[i] for i in positions])
+    except ValueError:
+        return scores
+    scores[positions] = cosine_similarity(tfidf_matrix[1:], tfidf_matrix[0:1]).ravel()
+    return scores
+
 def flatten_skills(skills_dict: Dict[str, List[str]]) -> List[str]:
     """Flattens the skills dictionary into a single list."""
     all_skills = []
@@ -28,19 +73,16 @@ def calculate_skill_score(cv_skills: Dict[str, List[str]], job_skills: Dict[str,
     """
     Calculates score based on matching skills.
     """
-    cv_flat = flatten_skills(cv_skills)
-    job_flat = flatten_skills(job_skills)
+    cv_bits, job_bits = SKILL_VOCABULARY.pack([skill_names(cv_skills), skill_names(job_skills)])
+    job_size = int(popcount(job_bits))
     
-    if not job_flat:
+    if not job_size:
         return {"score": 0, "matches": [], "missing": []}
         
-    cv_set = set(cv_flat)
-    job_set = set(job_flat)
+    matches = SKILL_VOCABULARY.unpack(cv_bits & job_bits)
+    missing = SKILL_VOCABULARY.unpack(job_bits & ~cv_bits)
     
-    matches = list(cv_set.intersection(job_set))
-    missing = list(job_set - cv_set)
-    
-    score = len(matches) / len(job_set) if job_set else 0
+    score = len(matches) / job_size
     
     return {
         "score": score,
@@ -48,26 +90,29 @@ def calculate_skill_score(cv_skills: Dict[str, List[str]], job_skills: Dict[str,
         "missing": missing
     }
 
-def calculate_education_score(cv_edu: List[str], job_edu: List[str]) -> float:
+def calculate_education_score(cv_edu: List[str], job_edu: List[str],
+                              policy: Optional[ScoringPolicy] = None) -> float:
     """
-    Calculates score based on matching education levels.
+    Calculates score based on the education levels, using the diploma
+    hierarchy of the scoring policy (e.g. Master > Licence).
     """
     if not job_edu:
         return 1.0 # If no education specified, assume match
         
-    cv_set = set(cv_edu)
-    job_set = set(job_edu)
-    
-    matches = list(cv_set.intersection(job_set))
-    
-    # Simple logic: if any required education is present, score is 1.0, else 0.0
-    # Can be improved with hierarchy (e.g. Master > Licence)
-    return 1.0 if matches else 0.0
+    policy = policy or DEFAULT_POLICY
+    cv_bits, job_bits = EDUCATION_VOCABULARY.pack([cv_edu, job_edu])
+    return float(policy.education_scores(cv_bits[None], job_bits[None], EDUCATION_VOCABULARY)[0])
 
-def match_profile(cv_data: Dict[str, Any], job_data: Dict[str, Any]) -> Dict[str, Any]:
+def match_profile(cv_data: Dict[str, Any], job_data: Dict[str, Any],
+                  text_similarity: Optional[float] = None,
+                  policy: Optional[ScoringPolicy] = None) -> Dict[str, Any]:
     """
     Combines different metrics to produce a final compatibility score.
     Formula: Score = 0.5 * Skills + 0.3 * Experience + 0.2 * Education
+    (default weights, see ScoringPolicy).
+
+    text_similarity can be supplied when it was already computed in bulk
+    (e.g. from the job index), which skips the per-pair TF-IDF fit.
     """
     # 1. Skill Match (S_comp)
     skill_metrics = calculate_skill_score(cv_data['skills'], job_data['required_skills'])
@@ -75,13 +120,18 @@ def match_profile(cv_data: Dict[str, Any], job_data: Dict[str, Any]) -> Dict[str
     
     # 2. Experience Match (S_exp)
     # We use Text Similarity as a proxy for Experience context match
-    s_exp = calculate_similarity(cv_data['cleaned_text'], job_data['cleaned_text'])
+    if text_similarity is None:
+        s_exp = calculate_similarity(cv_data['cleaned_text'], job_data['cleaned_text'])
+    else:
+        s_exp = text_similarity
     
     # 3. Education Match (S_form)
-    s_form = calculate_education_score(cv_data.get('education', []), job_data.get('required_education', []))
+    policy = policy or DEFAULT_POLICY
+    s_form = calculate_education_score(cv_data.get('education', []), job_data.get('required_education', []),
+                                       policy)
     
     # Weighted Average
-    final_score = (s_comp * 0.5) + (s_exp * 0.3) + (s_form * 0.2)
+    final_score = float(policy.total_scores(s_comp, s_exp, s_form))
     
     return {
         "total_score": round(final_score * 100, 2),
@@ -91,3 +141,102 @@ def match_profile(cv_data: Dict[str, Any], job_data: Dict[str, Any]) -> Dict[str
         "matching_skills": skill_metrics['matches'],
         "missing_skills": skill_metrics['missing']
     }
+
+class MatchBatch:
+    """
+    One source profile (CV or job) encoded against many targets.
+
+    Skills and education are encoded as packed bitsets over the keyword
+    vocabulary, so the skill and education scores of every pair come from an
+    AND and a popcount; result dicts are only built for rows that need them.
+
+    weights are the skills/text/education weights, either one row for the
+    whole batch or one row per target (see ScoringPolicy.weights_for); the
+    policy's default weights are used when omitted.
+    """
+
+    def __init__(self, source: Dict[str, Any], targets: Sequence[Dict[str, Any]],
+                 policy: Optional[ScoringPolicy] = None, weights: Optional[np.ndarray] = None):
+        with stage('match_batch', len(targets)):
+            self.source = source
+            self.targets = targets
+            self.policy = policy or DEFAULT_POLICY
+            self.weights = self.policy.weights if weights is None else np.asarray(weights, dtype=float)
+            self.source_is_job = 'required_skills' in source
+            if self.source_is_job:
+                jobs, cvs = [source], targets
+            else:
+                jobs, cvs = targets, [source]
+
+            # Packed bitsets over the keyword vocabulary, built for this batch only: bit
+            # positions are local to the process (unknown skills extend the vocabulary),
+            # so profiles are stored and cached as decoded skills, not as words
+            self.cv_skills = SKILL_VOCABULARY.pack([skill_names(cv['skills']) for cv in cvs])
+            self.job_skills = SKILL_VOCABULARY.pack([skill_names(job['required_skills']) for job in jobs])
+            cv_edu = EDUCATION_VOCABULARY.pack([cv.get('education') or [] for cv in cvs])
+            job_edu = EDUCATION_VOCABULARY.pack([job.get('required_education') or [] for job in jobs])
+            # The vocabularies may have grown while encoding, align the widths
+            n_words = packed_width(len(SKILL_VOCABULARY))
+            self.cv_skills = widen(self.cv_skills, n_words)
+            self.job_skills = widen(self.job_skills, n_words)
+            n_words = packed_width(len(EDUCATION_VOCABULARY))
+            cv_edu, job_edu = widen(cv_edu, n_words), widen(job_edu, n_words)
+
+            # One of the sides has a single row and broadcasts against the other
+            overlap = popcount(self.cv_skills & self.job_skills)
+            job_sizes = popcount(self.job_skills)
+            self.skill_scores = np.divide(overlap, job_sizes, out=np.zeros(overlap.shape), where=job_sizes > 0)
+
+            self.education_scores = self.policy.education_scores(cv_edu, job_edu, EDUCATION_VOCABULARY)
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    def text_similarities(self, positions: Optional[Sequence[int]] = None) -> np.ndarray:
+        """TF-IDF similarity between the source and the targets at positions (all by default)."""
+        if positions is None:
+            positions = range(len(self.targets))
+        with stage('text_similarity', len(positions)):
+            return calculate_similarities(self.source['cleaned_text'],
+                                          [self.targets[i]['cleaned_text'] for i in positions])
+
+    def total_scores(self, text_scores: np.ndarray) -> np.ndarray:
+        return self.policy.total_scores(self.skill_scores, text_scores, self.education_scores, self.weights)
+
+    def text_weights(self) -> np.ndarray:
+        """Weight of the text similarity for each target."""
+        return np.broadcast_to(self.weights[..., 1], (len(self.targets),))
+
+    def _weights(self, i: int) -> np.ndarray:
+        return self.weights if self.weights.ndim == 1 else self.weights[i if len(self.weights) > 1 else 0]
+
+    def result(self, i: int, text_score: float) -> Dict[str, Any]:
+        """Builds the match_profile-style dict for target i."""
+        cv_bits = self.cv_skills[i if self.source_is_job else 0]
+        job_bits = self.job_skills[0 if self.source_is_job else i]
+        final_score = self.policy.total_scores(self.skill_scores[i], text_score, self.education_scores[i],
+                                               self._weights(i))
+        return {
+            "total_score": round(float(final_score) * 100, 2),
+            "text_similarity": round(float(text_score) * 100, 2),
+            "skill_score": round(float(self.skill_scores[i]) * 100, 2),
+            "education_score": round(float(self.education_scores[i]) * 100, 2),
+            # Skill names are only decoded for the rows actually rendered
+            "matching_skills": SKILL_VOCABULARY.unpack(job_bits & cv_bits),
+            "missing_skills": SKILL_VOCABULARY.unpack(job_bits & ~cv_bits)
+        }
+
+def match_many(source: Dict[str, Any], targets: Sequence[Dict[str, Any]],
+               text_scores: Optional[Sequence[float]] = None, policy: Optional[ScoringPolicy] = None,
+               weights: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """
+    Batch version of match_profile: scores one CV against many jobs, or one
+    job against many CVs (detected from the 'required_skills' key).
+    Returns one match_profile-style dict per target, in order.
+    """
+    if not targets:
+        return []
+    batch = MatchBatch(source, targets, policy, weights)
+    if text_scores is None:
+        text_scores = batch.text_similarities()
+    return [batch.result(i, float(text_scores[i])) for i in range(len(batch))]
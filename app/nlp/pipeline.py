@@ -0,0 +1,73 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from app.metrics import timed
+from app.nlp.extraction import extract_content, iter_content
+from app.nlp.preprocessing import (preprocess_cv, preprocess_cvs, preprocess_job_description, extract_skills,
+                                   extract_education_level, KEYWORDS_VERSION, NER_MAX_CHARS)
+from app.nlp.registry import model_version
+
+def analysis_signature(limits: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Identifies everything besides the file content that shapes an analysis:
+    keyword dictionary, spaCy model, NER chunking and extraction limits.
+    """
+    payload = json.dumps([KEYWORDS_VERSION, model_version(), NER_MAX_CHARS, limits or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+@timed('analyze_cv')
+def analyze_cv_file(file_path: str, limits: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Extracts and analyses a CV file. Meant to run in worker processes, so it
+    only returns plain data and never touches the database.
+    Pages are streamed into preprocess_cv within the extraction limits
+    (see extraction.extraction_limits). Returns None when no text could be
+    extracted, and raises when the file cannot be read.
+    """
+    analysis = preprocess_cv(iter_content(file_path, **(limits or {})))
+    if not analysis['cleaned_text']:
+        return None
+    return analysis
+
+def analyze_cv_files(file_paths: List[str], batch_size: int = 32,
+                     limits: Optional[Dict[str, Any]] = None,
+                     n_process: int = 1) -> List[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Batch version of analyze_cv_file for bulk imports, the NER of the
+    whole batch running through nlp.pipe (batch_size, n_process).
+    Returns (file_path, analysis, error) tuples; analysis is None on failure.
+    """
+    results = []
+    readable = []
+    texts = []
+    for file_path in file_paths:
+        try:
+            text = extract_content(file_path, **(limits or {}))
+        except Exception as e:
+            results.append((file_path, None, str(e)))
+            continue
+        if text:
+            readable.append(file_path)
+            texts.append(text)
+        else:
+            results.append((file_path, None, "no text could be extracted"))
+
+    for file_path, analysis in zip(readable, preprocess_cvs(texts, batch_size=batch_size, n_process=n_process)):
+        results.append((file_path, analysis, None))
+    return results
+
+def extract_keywords(rows: List[Tuple[int, Optional[str]]], job: bool = False) -> List[Tuple[int, Any, List[str]]]:
+    """
+    Skills and education of stored texts, for re-extraction after a keyword
+    dictionary change: CV rows hold the cleaned text, offer rows the raw
+    description and requirements. Returns (id, skills, education) tuples;
+    like analyze_cv_files it runs in worker processes.
+    """
+    results = []
+    for row_id, text in rows:
+        if job:
+            analysis = preprocess_job_description(text or "")
+            results.append((row_id, analysis['required_skills'], analysis['required_education']))
+        else:
+            results.append((row_id, extract_skills(text or ""), extract_education_level(text or "")))
+    return results
@@ -1,27 +1,11 @@
-import spacy
 import re
 import json
 import os
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from typing import List, Dict, Any
-
-# Download necessary NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-
-# Load Spacy model
-try:
-    nlp = spacy.load("fr_core_news_sm")
-except OSError:
-    try:
-        nlp = spacy.load("en_core_web_sm")
-    except OSError:
-        nlp = spacy.blank("fr")
+import hashlib
+from typing import List, Dict, Any, Iterable, Tuple, Union
+from app.metrics import stage
+from app.nlp.keywords import KeywordMatcher, CategoryMatcher
+from app.nlp.registry import get_nlp
 
 def load_keywords():
     """Loads skills keywords from JSON file."""
@@ -34,6 +18,25 @@ def load_keywords():
 
 KEYWORDS = load_keywords()
 
+EDUCATION_KEYWORDS = [
+    "bac", "baccalauréat", "licence", "bachelor", "master", "mastère",
+    "ingénieur", "doctorat", "phd", "mba", "dut", "bts", "deug"
+]
+
+# Changes whenever the keyword dictionary or the education terms change
+KEYWORDS_VERSION = hashlib.sha256(
+    json.dumps([KEYWORDS, EDUCATION_KEYWORDS], sort_keys=True).encode('utf-8')
+).hexdigest()[:12]
+
+# Compiled once: each extraction is then a single pass over the text
+SKILL_MATCHER = CategoryMatcher(KEYWORDS)
+EDUCATION_MATCHER = KeywordMatcher(EDUCATION_KEYWORDS)
+
+# Entity labels kept from the NER, and the longest text given to it at once:
+# longer texts are split at whitespace so memory stays bounded
+NER_LABELS = ("ORG", "PERSON", "GPE")
+NER_MAX_CHARS = 20000
+
 def clean_text(text: str) -> str:
     """Cleans text by removing special characters and extra spaces."""
     text = re.sub(r'\s+', ' ', text)
@@ -41,62 +44,88 @@ def clean_text(text: str) -> str:
     return text.strip()
 
 def extract_emails(text: str) -> List[str]:
-    """Extracts emails using regex."""
+    """Extracts emails using regex, without duplicates, in document order."""
     email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-    return list(set(re.findall(email_pattern, text)))
+    return list(dict.fromkeys(re.findall(email_pattern, text)))
 
 def extract_skills(text: str) -> Dict[str, List[str]]:
     """
     Extracts skills based on the loaded JSON dictionary.
     """
-    found_skills = {
-        "languages": [],
-        "frameworks": [],
-        "tools": [],
-        "soft_skills": []
-    }
-    
-    lower_text = text.lower()
-    
-    for category, skills in KEYWORDS.items():
-        for skill in skills:
-            # Regex for whole word matching
-            if re.search(r'\b' + re.escape(skill) + r'\b', lower_text):
-                found_skills[category].append(skill)
-                
-    return found_skills
+    return SKILL_MATCHER.find(
+        text.lower(),
+        default_categories=["languages", "frameworks", "tools", "soft_skills"]
+    )
 
 def extract_education_level(text: str) -> List[str]:
     """
     Extracts education levels based on keywords.
     """
-    education_keywords = [
-        "bac", "baccalauréat", "licence", "bachelor", "master", "mastère", 
-        "ingénieur", "doctorat", "phd", "mba", "dut", "bts", "deug"
-    ]
-    found_education = []
-    lower_text = text.lower()
-    for keyword in education_keywords:
-        if re.search(r'\b' + re.escape(keyword) + r'\b', lower_text):
-            found_education.append(keyword)
-    return list(set(found_education))
-
-def preprocess_cv(text: str) -> Dict[str, Any]:
+    return list(EDUCATION_MATCHER.find(text.lower()))
+
+def _clean_pages(text: Union[str, Iterable[str]]) -> Tuple[str, List[str]]:
     """
-    Performs full preprocessing and extraction on CV text.
+    Cleans a text given whole or as an iterable of pages, one page at a time,
+    and collects the emails along the way, in document order. Returns
+    (cleaned_text, emails).
     """
-    cleaned_text = clean_text(text)
-    emails = extract_emails(text)
-    skills = extract_skills(cleaned_text)
-    education = extract_education_level(cleaned_text)
-    
-    # Basic entity extraction with Spacy
-    doc = nlp(cleaned_text)
-    entities = {
-        "ORG": [ent.text for ent in doc.ents if ent.label_ == "ORG"],
-        "PERSON": [ent.text for ent in doc.ents if ent.label_ == "PERSON"],
-        "GPE": [ent.text for ent in doc.ents if ent.label_ == "GPE"]
-    }
+    pages = [text] if isinstance(text, str) else text
+    cleaned_pages = []
+    emails = {}
+    for page in pages:
+        with stage('extract_emails', len(page)):
+            emails.update(dict.fromkeys(extract_emails(page)))
+        with stage('clean_text', len(page)):
+            cleaned_page = clean_text(page)
+        if cleaned_page:
+            cleaned_pages.append(cleaned_page)
+    return " ".join(cleaned_pages), list(emails)
+
+def _chunks(text: str, max_chars: int) -> List[str]:
+    """Splits a text into pieces of at most max_chars, at whitespace when possible."""
+    chunks = []
+    while len(text) > max_chars:
+        cut = text.rfind(' ', 0, max_chars + 1)
+        if cut <= 0:
+            cut = max_chars
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip()
+    if text:
+        chunks.append(text)
+    return chunks
+
+def extract_entities(texts: List[str], batch_size: int = 32, n_process: int = 1) -> List[Dict[str, List[str]]]:
+    """
+    Named entities (NER_LABELS) of many texts through a single nlp.pipe
+    stream: texts are chunked to NER_MAX_CHARS, batched across documents,
+    optionally spread over n_process processes, and each document's
+    entities are grouped by label in one pass. The pipeline only runs NER
+    (see registry.SPACY_EXCLUDE), and is skipped altogether when it has no
+    component able to find entities (blank fallback model).
+    """
+    entities = [{label: [] for label in NER_LABELS} for _ in texts]
+    nlp = get_nlp()
+    owners, chunks = [], []
+    for i, text in enumerate(texts):
+        for chunk in _chunks(text, NER_MAX_CHARS):
+            owners.append(i)
+            chunks.append(chunk)
+    with stage('spacy_ner', len(texts)):
+        if not nlp.pipe_names or not chunks:
+            return entities
+        docs = nlp.pipe(chunks, batch_size=batch_size, n_process=n_process)
+        for owner, doc in zip(owners, docs):
+            found = entities[owner]
+            for ent in doc.ents:
+                if ent.label_ in found:
+                    found[ent.label_].append(ent.text)
+    return entities
+
+def _cv_analysis(cleaned_text: str, emails: List[str], entities: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Builds the CV analysis dict from the cleaned text, emails and named entities."""
+    with stage('keyword_extraction', len(cleaned_text)):
+        skills = extract_skills(cleaned_text)
+        education = extract_education_level(cleaned_text)
 
     return {
         "cleaned_text": cleaned_text,
@@ -106,13 +135,35 @@ def preprocess_cv(text: str) -> Dict[str, Any]:
         "entities": entities
     }
 
+def preprocess_cv(text: Union[str, Iterable[str]]) -> Dict[str, Any]:
+    """
+    Performs full preprocessing and extraction on CV text.
+    The text can also be an iterable of pages (e.g. extraction.iter_content),
+    which is consumed incrementally.
+    """
+    cleaned_text, emails = _clean_pages(text)
+    return _cv_analysis(cleaned_text, emails, extract_entities([cleaned_text])[0])
+
+def preprocess_cvs(texts: List[Union[str, Iterable[str]]], batch_size: int = 32,
+                   n_process: int = 1) -> List[Dict[str, Any]]:
+    """
+    Same as preprocess_cv for a list of texts, with the NER of every text
+    run as one batched stream (see extract_entities).
+    """
+    cleaned = [_clean_pages(text) for text in texts]
+    entities = extract_entities([cleaned_text for cleaned_text, _ in cleaned], batch_size, n_process)
+    return [_cv_analysis(cleaned_text, emails, found)
+            for (cleaned_text, emails), found in zip(cleaned, entities)]
+
 def preprocess_job_description(text: str) -> Dict[str, Any]:
     """
     Analyzes job description to extract requirements.
     """
-    cleaned_text = clean_text(text)
-    skills = extract_skills(cleaned_text)
-    education = extract_education_level(cleaned_text)
+    with stage('clean_text', len(text)):
+        cleaned_text = clean_text(text)
+    with stage('keyword_extraction', len(cleaned_text)):
+        skills = extract_skills(cleaned_text)
+        education = extract_education_level(cleaned_text)
     
     return {
         "cleaned_text": cleaned_text,
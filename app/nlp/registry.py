@@ -0,0 +1,65 @@
+import os
+import threading
+
+# Tried in order; SPACY_MODEL overrides the first choice
+SPACY_MODELS = ("fr_core_news_sm", "en_core_web_sm")
+
+# Only NER is used, so the other trained components are not even loaded
+SPACY_EXCLUDE = ["tagger", "morphologizer", "parser", "senter", "attribute_ruler", "lemmatizer"]
+
+_models = {}
+_lock = threading.Lock()
+
+def _model_names():
+    names = list(SPACY_MODELS)
+    if os.environ.get('SPACY_MODEL'):
+        names.insert(0, os.environ['SPACY_MODEL'])
+    return names
+
+def _load_spacy():
+    import spacy
+
+    for name in _model_names():
+        try:
+            nlp = spacy.load(name, exclude=SPACY_EXCLUDE)
+        except OSError:
+            continue
+        # Keep the shared tok2vec only if NER listens to it
+        if "tok2vec" in nlp.pipe_names and not getattr(nlp.get_pipe("tok2vec"), "listening_components", None):
+            nlp.disable_pipe("tok2vec")
+        return nlp
+    return spacy.blank("fr")
+
+def get_nlp():
+    """
+    Returns the spaCy pipeline, loaded on first use and then cached for the
+    lifetime of the process.
+    """
+    nlp = _models.get('spacy')
+    if nlp is None:
+        with _lock:
+            nlp = _models.get('spacy')
+            if nlp is None:
+                nlp = _models['spacy'] = _load_spacy()
+    return nlp
+
+def model_version() -> str:
+    """
+    Name and version of the spaCy model that get_nlp loads, read from the
+    installed package metadata so the model itself is not loaded.
+    """
+    from importlib import metadata
+
+    for name in _model_names():
+        try:
+            return f"{name}-{metadata.version(name)}"
+        except metadata.PackageNotFoundError:
+            continue
+    return "blank-fr"
+
+def warmup():
+    """
+    Loads every model up front. Used as the initializer of worker processes
+    so the first CV they receive does not pay for the model load.
+    """
+    get_nlp()
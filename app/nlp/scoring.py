@@ -0,0 +1,90 @@
+import hashlib
+import json
+import numpy as np
+from typing import Any, Iterable, Mapping, Optional
+from app.nlp.vocabulary import Vocabulary, popcount
+
+DEFAULT_WEIGHTS = {"skills": 0.5, "text": 0.3, "education": 0.2}
+
+# Ordinal ranking of diplomas, terms of the same level share a rank
+EDUCATION_LEVELS = {
+    "bac": 1, "baccalauréat": 1,
+    "dut": 2, "bts": 2, "deug": 2,
+    "licence": 3, "bachelor": 3,
+    "master": 4, "mastère": 4, "ingénieur": 4, "mba": 4,
+    "doctorat": 5, "phd": 5
+}
+
+def _weight_row(weights: Mapping[str, float]) -> np.ndarray:
+    return np.array([weights["skills"], weights["text"], weights["education"]], dtype=float)
+
+class ScoringPolicy:
+    """
+    Weights of the compatibility score (with optional per-company
+    overrides) and the diploma hierarchy used for the education score.
+
+    The hierarchy is compiled into a lookup array over the education
+    vocabulary, so the education score of every pair of a batch is a
+    vectorized comparison between the highest diploma of the CV and the
+    lowest diploma accepted by the offer.
+    """
+
+    def __init__(self, weights: Optional[Mapping[str, float]] = None,
+                 education_levels: Optional[Mapping[str, int]] = None,
+                 company_weights: Optional[Mapping[Any, Mapping[str, float]]] = None):
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.education_levels = dict(education_levels or EDUCATION_LEVELS)
+        company_weights = {int(company_id): {**weights, **overrides}
+                           for company_id, overrides in (company_weights or {}).items()}
+        self.weights = _weight_row(weights)
+        self.company_weights = {company_id: _weight_row(row) for company_id, row in company_weights.items()}
+        self.version = hashlib.sha256(json.dumps(
+            [weights, self.education_levels, sorted(company_weights.items())], sort_keys=True
+        ).encode('utf-8')).hexdigest()[:12]
+        self._levels = np.zeros(0)
+
+    @classmethod
+    def from_config(cls, config) -> 'ScoringPolicy':
+        return cls(config.get('SCORING_WEIGHTS'), config.get('SCORING_EDUCATION_LEVELS'),
+                   config.get('SCORING_COMPANY_WEIGHTS'))
+
+    def weights_for(self, company_ids: Iterable[Optional[int]]) -> np.ndarray:
+        """(n x 3) skills/text/education weights, one row per company."""
+        rows = [self.company_weights.get(company_id, self.weights) for company_id in company_ids]
+        return np.array(rows, dtype=float).reshape(-1, 3)
+
+    def levels(self, vocabulary: Vocabulary) -> np.ndarray:
+        """Rank of each term of the vocabulary (0 when unranked), rebuilt when it grows."""
+        if len(self._levels) != len(vocabulary):
+            self._levels = np.array([self.education_levels.get(term, 0) for term in vocabulary.terms],
+                                    dtype=float)
+        return self._levels
+
+    def education_scores(self, cv_bits: np.ndarray, job_bits: np.ndarray, vocabulary: Vocabulary) -> np.ndarray:
+        """
+        Education score of packed CV rows against packed offer rows (one of
+        the two has a single row): 1.0 when the offer asks for nothing, when
+        a requested diploma is present or when the CV reaches the lowest
+        requested level, else the ratio between the two levels.
+        """
+        levels = self.levels(vocabulary)
+        cv_levels = (_unpack(cv_bits, len(levels)) * levels).max(axis=1, initial=0)
+        job_ranked = _unpack(job_bits, len(levels)) & (levels > 0)
+        job_levels = np.where(job_ranked, levels, np.inf).min(axis=1, initial=np.inf)
+
+        ordinal = np.where(np.isfinite(job_levels), np.minimum(cv_levels / job_levels, 1.0), 0.0)
+        exact = popcount(cv_bits & job_bits) > 0
+        return np.where((popcount(job_bits) == 0) | exact, 1.0, ordinal)
+
+    def total_scores(self, skill_scores: np.ndarray, text_scores: np.ndarray,
+                     education_scores: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+        weights = self.weights if weights is None else weights
+        return (skill_scores * weights[..., 0]) + (text_scores * weights[..., 1]) + \
+            (education_scores * weights[..., 2])
+
+def _unpack(bits: np.ndarray, n_terms: int) -> np.ndarray:
+    """Boolean (rows x n_terms) matrix of packed rows."""
+    matrix = np.unpackbits(np.ascontiguousarray(bits).astype('<u8').view(np.uint8), axis=1, bitorder='little')
+    return matrix[:, :n_terms].astype(bool)
+
+DEFAULT_POLICY = ScoringPolicy()
@@ -0,0 +1,70 @@
+import threading
+import numpy as np
+from typing import Dict, Iterable, Tuple
+
+class SkillIndex:
+    """
+    Inverted index from skill names to the ids of the candidates having them.
+
+    Posting lists are sorted numpy arrays, so the candidates sharing at least
+    one skill with an offer (and how many they share) come out of a single
+    concatenate + unique instead of a scan over every profile.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, np.ndarray] = {}
+        self.skills_of: Dict[int, frozenset] = {}
+        # Sync state, see app.candidates.index.get_skill_index
+        self.synced_at = None
+        self.checked_at = 0.0
+        self.full_synced_at = 0.0
+        self.stale = False
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.skills_of)
+
+    def candidate_ids(self) -> set:
+        with self.lock:
+            return set(self.skills_of)
+
+    def update(self, profiles: Dict[int, Iterable[str]]):
+        """Replaces the skills of the given candidates (an empty list removes them)."""
+        with self.lock:
+            removed: Dict[str, list] = {}
+            added: Dict[str, list] = {}
+            for candidate_id, skills in profiles.items():
+                old = self.skills_of.get(candidate_id, frozenset())
+                new = frozenset(skills)
+                for skill in old - new:
+                    removed.setdefault(skill, []).append(candidate_id)
+                for skill in new - old:
+                    added.setdefault(skill, []).append(candidate_id)
+                if new:
+                    self.skills_of[candidate_id] = new
+                else:
+                    self.skills_of.pop(candidate_id, None)
+
+            for skill, ids in removed.items():
+                postings = self.postings[skill]
+                postings = postings[~np.isin(postings, ids)]
+                if len(postings):
+                    self.postings[skill] = postings
+                else:
+                    del self.postings[skill]
+            for skill, ids in added.items():
+                postings = self.postings.get(skill)
+                ids = np.asarray(ids, dtype=np.int64)
+                self.postings[skill] = np.unique(ids) if postings is None else np.union1d(postings, ids)
+
+    def overlap(self, skills: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (candidate_ids, shared_counts) for every candidate sharing at
+        least one of the skills, ids in ascending order.
+        """
+        # Under the lock: update may delete a posting list between the test and the read
+        with self.lock:
+            postings = [self.postings[skill] for skill in set(skills) if skill in self.postings]
+        if not postings:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(postings), return_counts=True)
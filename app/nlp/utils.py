@@ -1,16 +1,40 @@
+import hashlib
 import os
-import uuid
+import tempfile
 from werkzeug.utils import secure_filename
 
 def save_uploaded_file(file, upload_folder):
     """
-    Saves an uploaded file to the specified folder with a unique name.
+    Saves an uploaded file to the specified folder, named after the SHA-256
+    of its content so identical uploads share a single stored copy.
     """
     if not os.path.exists(upload_folder):
         os.makedirs(upload_folder)
         
     filename = secure_filename(file.filename)
-    unique_filename = f"{uuid.uuid4().hex}_{filename}"
-    file_path = os.path.join(upload_folder, unique_filename)
-    file.save(file_path)
+    extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'bin'
+
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=upload_folder, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as out:
+        for chunk in iter(lambda: file.stream.read(1024 * 1024), b''):
+            digest.update(chunk)
+            out.write(chunk)
+
+    file_path = os.path.join(upload_folder, f"{digest.hexdigest()}.{extension}")
+    if os.path.exists(file_path):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, file_path)
     return file_path
+
+def file_digest(file_path):
+    """Content hash of a file stored by save_uploaded_file (or import-cvs)."""
+    name = os.path.basename(file_path).split('.', 1)[0]
+    if len(name) == 64:
+        return name
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,79 @@
+import threading
+import numpy as np
+from typing import Any, Iterable, List, Sequence
+
+class Vocabulary:
+    """
+    Append-only mapping between terms (skills, diplomas) and bit positions.
+    Unknown terms get a new column on first sight, so profiles extracted with
+    an older keyword dictionary still encode exactly.
+    """
+
+    def __init__(self, terms: Iterable[str] = ()):
+        self.terms: List[str] = []
+        self.index = {}
+        self.lock = threading.Lock()
+        for term in terms:
+            self.add(term)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def add(self, term: str) -> int:
+        column = self.index.get(term)
+        if column is None:
+            with self.lock:
+                column = self.index.get(term)
+                if column is None:
+                    column = len(self.terms)
+                    self.terms.append(term)
+                    self.index[term] = column
+        return column
+
+    def pack(self, rows: Sequence[Iterable[str]], n_words: int = 0) -> np.ndarray:
+        """
+        Encodes each row of terms as a bitset: a (rows x words) uint64 array
+        where bit c of the row is set when the row has the term of column c.
+        The width covers the whole vocabulary (at least n_words words).
+        """
+        columns = [[self.add(term) for term in row] for row in rows]
+        bits = np.zeros((len(rows), max(n_words, packed_width(len(self)))), dtype=np.uint64)
+        row_of = np.repeat(np.arange(len(rows)), [len(row) for row in columns])
+        flat = np.fromiter((column for row in columns for column in row), dtype=np.uint64, count=len(row_of))
+        np.bitwise_or.at(bits, (row_of, (flat >> np.uint64(6)).astype(np.intp)),
+                         np.left_shift(np.uint64(1), flat & np.uint64(63)))
+        return bits
+
+    def unpack(self, bits: np.ndarray) -> List[str]:
+        """Terms of one packed row, in column order."""
+        columns = np.flatnonzero(np.unpackbits(bits.astype('<u8').view(np.uint8), bitorder='little'))
+        return self.decode(columns)
+
+    def decode(self, columns: Iterable[int]) -> List[str]:
+        return [self.terms[column] for column in columns]
+
+def packed_width(n_terms: int) -> int:
+    """Number of uint64 words needed for n_terms bits."""
+    return (n_terms + 63) // 64
+
+def widen(bits: np.ndarray, n_words: int) -> np.ndarray:
+    """Pads packed rows with zero words up to n_words."""
+    if bits.shape[1] >= n_words:
+        return bits
+    return np.pad(bits, ((0, 0), (0, n_words - bits.shape[1])))
+
+# Set bits per byte, for numpy versions without bitwise_count
+_BYTE_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+def popcount(bits: np.ndarray) -> np.ndarray:
+    """Number of set bits of each packed row."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bits).sum(axis=-1, dtype=np.int64)
+    counts = _BYTE_POPCOUNT[np.ascontiguousarray(bits).view(np.uint8)]
+    return counts.sum(axis=-1, dtype=np.int64)
+
+def skill_names(skills: Any) -> List[str]:
+    """Flattens a category dict (or a plain list) of skills into names."""
+    if isinstance(skills, dict):
+        return [skill for category in skills.values() for skill in category]
+    return list(skills or [])
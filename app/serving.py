@@ -0,0 +1,42 @@
+import gc
+from app import db, metrics
+from app.metrics import stage
+
+def warmup(app):
+    """
+    Loads the spaCy model, the keyword automata and the job, skill and
+    embedding indexes, then marks the app ready (see /readyz).
+
+    Called once in the gunicorn master before it forks its workers
+    (preload_app), so they all share these read-only structures through
+    copy-on-write instead of each loading its own copy.
+    """
+    from app.candidates.index import get_skill_index
+    from app.candidates.ingestion import ingestion_queue
+    from app.jobs.index import get_job_index, get_vector_index
+    from app.nlp import preprocessing
+    from app.nlp.registry import warmup as load_models
+
+    with stage('warmup'):
+        load_models()
+        # The automata are built on import, a first search touches their tables
+        preprocessing.extract_skills("warmup")
+        with app.app_context():
+            get_job_index()
+            get_skill_index()
+            get_vector_index()
+            if app.config['INGESTION_ASYNC']:
+                # Once per server start: the workers then claim these rows on their first request
+                ingestion_queue.recover(app)
+            # Workers must open their own connections, not share the master's sockets
+            db.session.remove()
+            db.engine.dispose()
+    # Objects loaded so far are never collected: the collector would
+    # otherwise touch their pages in every worker and un-share them
+    gc.freeze()
+    # The workers forked from here start with empty registries
+    metrics.flush()
+    app.extensions['ready'] = True
+
+def is_ready(app) -> bool:
+    return bool(app.extensions.get('ready'))
@@ -0,0 +1,117 @@
+import random
+from collections import namedtuple
+from typing import Dict, Iterator
+import docx
+from app.nlp.preprocessing import KEYWORDS
+from app.nlp.scoring import EDUCATION_LEVELS
+
+# Ground truth of a generated document, so benchmarks can fill a database
+# without running the NLP pipeline on every document
+SyntheticCV = namedtuple('SyntheticCV', 'first_name last_name email text skills education')
+SyntheticJob = namedtuple('SyntheticJob', 'title description requirements skills education')
+
+FIRST_NAMES = ["Ahmed", "Sarah", "Youssef", "Camille", "Lina", "Thomas", "Fatima", "Lucas", "Amine", "Chloé",
+               "Omar", "Emma", "Mehdi", "Léa", "Karim", "Julie", "Nadia", "Hugo", "Salma", "Louis"]
+LAST_NAMES = ["Benali", "Martin", "El Amrani", "Dubois", "Haddad", "Bernard", "Mansouri", "Petit", "Tazi",
+              "Moreau", "Chaouki", "Laurent", "Idrissi", "Simon", "Alaoui", "Michel", "Berrada", "Garcia"]
+JOB_TITLES = {
+    "fr": ["Développeur Full Stack", "Ingénieur Logiciel", "Data Scientist", "Ingénieur DevOps",
+           "Développeur Backend", "Chef de Projet Technique", "Analyste de Données"],
+    "en": ["Full Stack Developer", "Software Engineer", "Data Scientist", "DevOps Engineer",
+           "Backend Developer", "Technical Project Manager", "Data Analyst"]
+}
+COMPANIES = ["Capgemini", "Orange", "Sopra Steria", "OCP", "Atos", "Inwi", "Thales", "CGI", "Société Générale"]
+CITIES = ["Paris", "Casablanca", "Lyon", "Rabat", "Marseille", "Tanger", "Lille", "Marrakech"]
+
+TEXTS = {
+    "fr": {
+        "summary": "{title} avec {years} ans d'expérience, passionné par la qualité logicielle et le travail en équipe.",
+        "experience": "{start} - {end} : {title} chez {company} à {city}. Conception et développement de "
+                      "services utilisant {skills}. Participation aux revues de code et à la mise en production.",
+        "education": "{diploma} en informatique, Université de {city}, {year}.",
+        "skills": "Compétences : {skills}.",
+        "job": "Nous recherchons un(e) {title} pour rejoindre notre équipe à {city}. Vous travaillerez sur "
+               "des projets à fort impact et maîtrisez {skills}. Télétravail partiel possible.",
+        "requirements": "Profil : {diploma} ou équivalent, bonne maîtrise de {skills}."
+    },
+    "en": {
+        "summary": "{title} with {years} years of experience, passionate about software quality and teamwork.",
+        "experience": "{start} - {end}: {title} at {company}, {city}. Designed and built services "
+                      "using {skills}. Took part in code reviews and production releases.",
+        "education": "{diploma} in computer science, University of {city}, {year}.",
+        "skills": "Skills: {skills}.",
+        "job": "We are looking for a {title} to join our team in {city}. You will work on high-impact "
+               "projects and master {skills}. Partial remote work available.",
+        "requirements": "Requirements: {diploma} or equivalent, strong command of {skills}."
+    }
+}
+
+VOCABULARY = sorted({skill for skills in KEYWORDS.values() for skill in skills})
+DIPLOMAS = sorted(EDUCATION_LEVELS)
+
+def _language(rng: random.Random, french_ratio: float) -> str:
+    return "fr" if rng.random() < french_ratio else "en"
+
+def generate_cv(rng: random.Random, french_ratio: float = 0.5) -> SyntheticCV:
+    """One CV drawing its skills and diplomas from the keyword vocabulary."""
+    texts = TEXTS[_language(rng, french_ratio)]
+    first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    email = f"{first_name}.{last_name}{rng.randrange(10000)}@example.com".lower().replace(' ', '')
+    skills = rng.sample(VOCABULARY, rng.randint(3, 12))
+    education = rng.sample(DIPLOMAS, rng.randint(1, 2))
+    title = rng.choice(JOB_TITLES["fr"] + JOB_TITLES["en"])
+
+    lines = [f"{first_name} {last_name}", email,
+             texts["summary"].format(title=title, years=rng.randint(1, 15))]
+    year = 2024
+    for _ in range(rng.randint(1, 4)):
+        start = year - rng.randint(1, 4)
+        lines.append(texts["experience"].format(
+            start=start, end=year, title=title, company=rng.choice(COMPANIES), city=rng.choice(CITIES),
+            skills=", ".join(rng.sample(skills, min(3, len(skills))))))
+        year = start
+    for diploma in education:
+        lines.append(texts["education"].format(diploma=diploma.capitalize(), city=rng.choice(CITIES),
+                                               year=year - rng.randint(0, 3)))
+    lines.append(texts["skills"].format(skills=", ".join(skills)))
+    return SyntheticCV(first_name, last_name, email, "\n".join(lines), skills, education)
+
+def generate_job(rng: random.Random, french_ratio: float = 0.5) -> SyntheticJob:
+    """One job offer drawing its required skills and diploma from the keyword vocabulary."""
+    language = _language(rng, french_ratio)
+    texts = TEXTS[language]
+    skills = rng.sample(VOCABULARY, rng.randint(2, 8))
+    education = rng.sample(DIPLOMAS, rng.randint(0, 1))
+    title = rng.choice(JOB_TITLES[language])
+    description = texts["job"].format(title=title, city=rng.choice(CITIES), skills=", ".join(skills[:3]))
+    requirements = texts["requirements"].format(diploma=education[0] if education else "bac",
+                                                skills=", ".join(skills[3:] or skills))
+    return SyntheticJob(title, description, requirements, skills, education)
+
+def iter_cvs(n: int, seed: int = 0, french_ratio: float = 0.5) -> Iterator[SyntheticCV]:
+    """Yields n CVs, the same ones for a given seed."""
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield generate_cv(rng, french_ratio)
+
+def iter_jobs(n: int, seed: int = 0, french_ratio: float = 0.5) -> Iterator[SyntheticJob]:
+    """Yields n job offers, the same ones for a given seed."""
+    rng = random.Random(seed + 1)
+    for _ in range(n):
+        yield generate_job(rng, french_ratio)
+
+def write_docx(cv: SyntheticCV, path: str):
+    """Writes a CV as a DOCX file, one paragraph per line."""
+    document = docx.Document()
+    for line in cv.text.split("\n"):
+        document.add_paragraph(line)
+    document.save(path)
+
+def cv_profile(cv: SyntheticCV) -> Dict[str, object]:
+    """The matching input of a CV, from its ground truth."""
+    return {"skills": {"skills": cv.skills}, "education": cv.education, "cleaned_text": cv.text}
+
+def job_profile(job: SyntheticJob) -> Dict[str, object]:
+    """The matching input of a job offer, from its ground truth."""
+    return {"required_skills": {"skills": job.skills}, "required_education": job.education,
+            "cleaned_text": job.description}
@@ -0,0 +1,68 @@
+"""
+In-memory ranking of a whole corpus against one profile, with text
+similarity pruned by score bounds. The app ranks from the stored match
+scores instead (app.jobs.scores); this is kept as the full-corpus
+reference timed by bench_matching.
+"""
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from app.metrics import timed
+from app.nlp.matching import MatchBatch
+from app.nlp.scoring import ScoringPolicy
+
+def top_k(scores: np.ndarray, k: int, candidates: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Positions of the k best scores, best first, without sorting the whole array.
+    Ties are broken by position so pagination is stable between requests.
+    """
+    if candidates is None:
+        candidates = np.arange(len(scores))
+    if k <= 0 or len(candidates) == 0:
+        return np.array([], dtype=int)
+    values = scores[candidates]
+    if k < len(candidates):
+        kth = np.partition(values, len(values) - k)[len(values) - k]
+        # Keep every tie of the k-th score so the position tie-break is exact
+        keep = values >= kth
+        candidates, values = candidates[keep], values[keep]
+    order = np.lexsort((candidates, -values))
+    return candidates[order][:k]
+
+@timed('rank')
+def rank(source: Dict[str, Any], targets: Sequence[Dict[str, Any]], offset: int = 0, limit: int = 20,
+         text_scorer: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+         policy: Optional[ScoringPolicy] = None,
+         weights: Optional[np.ndarray] = None) -> Tuple[int, List[Tuple[int, Dict[str, Any]]]]:
+    """
+    Ranks targets against source and returns (total, page) where page holds
+    (target position, match result) pairs for ranks [offset, offset + limit).
+
+    Skill and education scores are cheap and give a lower bound on each total
+    score (text similarity >= 0) and an upper bound (text similarity <= 1).
+    Text similarity is only computed for targets whose upper bound reaches the
+    worst lower bound of the current top (offset + limit); the others cannot
+    make it to the requested page.
+    """
+    total = len(targets)
+    needed = min(offset + limit, total)
+    if needed <= 0 or offset >= total:
+        return total, []
+
+    batch = MatchBatch(source, targets, policy, weights)
+    lower = batch.total_scores(np.zeros(total))
+    upper = lower + batch.text_weights()
+    threshold = np.partition(lower, total - needed)[total - needed]
+    # Half a display rounding unit of slack, pruned targets cannot even tie
+    survivors = np.flatnonzero(upper + 0.00005 >= threshold)
+
+    text_scores = np.zeros(total)
+    if text_scorer is None:
+        text_scores[survivors] = batch.text_similarities(survivors)
+    else:
+        text_scores[survivors] = text_scorer(survivors)
+
+    # Rank on the displayed (rounded) score so ties behave like a full sort
+    final_scores = np.round(batch.total_scores(text_scores) * 100, 2)
+    best = top_k(final_scores, needed, survivors)
+    page = [(int(i), batch.result(int(i), float(text_scores[i]))) for i in best[offset:]]
+    return total, page
@@ -0,0 +1,310 @@
+"""
+Benchmarks of the extraction, NLP and matching code paths on a synthetic
+corpus, reported as JSON for regression comparison.
+
+    python -m benchmarks.run --cvs 1000 --jobs 200 --output bench.json
+    python -m benchmarks.run --cvs 1000 --jobs 200 --baseline bench.json
+
+Each stage reports its throughput, p50/p99 latency and the peak memory
+allocated while it runs (tracemalloc, measured on a separate pass so it
+does not slow down the timed one).
+"""
+import os
+import tempfile
+
+# The app reads its configuration on import: point it to a scratch database
+# and keep CV analysis synchronous before anything from app is imported
+_WORKDIR = tempfile.mkdtemp(prefix='cv-bench-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_WORKDIR, 'bench.db')
+os.environ['INGESTION_ASYNC'] = '0'
+os.environ['ANALYSIS_CACHE_FOLDER'] = os.path.join(_WORKDIR, 'cache')
+# Route timings measure queries and rendering; cache hits are reported apart (bench_routes)
+os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+from app import create_app, db
+from app.cache import MemoryCache
+from app.models import User, Company, Candidate, JobOffer, Skill, candidate_skill
+from app.nlp.extraction import extract_content
+from app.nlp.index import JobIndex, serialize_vector
+from app.nlp.matching import match_profile, match_many
+from app.nlp.preprocessing import extract_entities, preprocess_cv, preprocess_cvs, KEYWORDS_VERSION
+from app.nlp.registry import model_version, warmup
+from benchmarks.corpus import iter_cvs, iter_jobs, write_docx, cv_profile, job_profile, VOCABULARY
+from benchmarks.ranking import rank
+
+# Rows per INSERT when filling the route benchmark database
+INSERT_CHUNK_SIZE = 10000
+
+def measure(calls: Sequence[Callable[[], Any]], items_per_call: int = 1, memory_samples: int = 5) -> Dict[str, Any]:
+    """Times each call, then replays the first memory_samples calls under tracemalloc."""
+    latencies = []
+    start = time.perf_counter()
+    for call in calls:
+        call_start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for call in calls[:memory_samples]:
+        call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "calls": len(calls),
+        "items": len(calls) * items_per_call,
+        "seconds": round(elapsed, 4),
+        "throughput_per_s": round(len(calls) * items_per_call / elapsed, 2) if elapsed else None,
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3) if len(calls) else None,
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3) if len(calls) else None,
+        "peak_memory_bytes": peak
+    }
+
+def bench_extraction(cvs, n_files: int, memory_samples: int) -> Dict[str, Any]:
+    """extract_content on generated DOCX files."""
+    folder = os.path.join(_WORKDIR, 'docx')
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i, cv in enumerate(islice(cvs, n_files)):
+        paths.append(os.path.join(folder, f"cv_{i}.docx"))
+        write_docx(cv, paths[-1])
+    return measure([lambda path=path: extract_content(path) for path in paths], memory_samples=memory_samples)
+
+def bench_preprocessing(texts: List[str], batch_size: int, memory_samples: int) -> Dict[str, Dict[str, Any]]:
+    """preprocess_cv one text at a time, preprocess_cvs and the NER alone in nlp.pipe batches."""
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    return {
+        "spacy_ner": measure([lambda batch=batch: extract_entities(batch, batch_size) for batch in batches],
+                             items_per_call=batch_size, memory_samples=memory_samples),
+        "preprocess_cv": measure([lambda text=text: preprocess_cv(text) for text in texts],
+                                 memory_samples=memory_samples),
+        "preprocess_cvs": measure([lambda batch=batch: preprocess_cvs(batch, batch_size) for batch in batches],
+                                  items_per_call=batch_size, memory_samples=memory_samples)
+    }
+
+def bench_matching(cv_profiles, job_profiles, n_pairs: int, n_queries: int,
+                   memory_samples: int) -> Dict[str, Dict[str, Any]]:
+    """Single-pair match_profile, and full rankings over the whole corpus."""
+    rng = np.random.default_rng(0)
+    pairs = [(cv_profiles[i], job_profiles[j]) for i, j in zip(rng.integers(len(cv_profiles), size=n_pairs),
+                                                                rng.integers(len(job_profiles), size=n_pairs))]
+    results = {
+        "match_profile": measure([lambda cv=cv, job=job: match_profile(cv, job) for cv, job in pairs],
+                                 memory_samples=memory_samples),
+        "match_profile_precomputed_text": measure(
+            [lambda cv=cv, job=job: match_profile(cv, job, 0.5) for cv, job in pairs],
+            memory_samples=memory_samples)
+    }
+
+    index = JobIndex()
+    index.add(range(1, len(job_profiles) + 1), [job['cleaned_text'] for job in job_profiles])
+    counts = index.term_counts([cv['cleaned_text'] for cv in cv_profiles])
+    queries = rng.integers(len(job_profiles), size=n_queries)
+
+    def rank_candidates(j):
+        job_vector = index.job_vector(int(j) + 1)
+        return rank(job_profiles[j], cv_profiles, 0, 20,
+                    text_scorer=lambda positions: (index.weigh(counts[positions]) @ job_vector.T).toarray().ravel())
+
+    def rank_jobs(i):
+        similarities = index.similarities_from_counts(counts[int(i)])
+        return match_many(cv_profiles[i], job_profiles,
+                          [similarities.get(job_id, 0.0) for job_id in range(1, len(job_profiles) + 1)])
+
+    results["rank_candidates"] = measure([lambda j=j: rank_candidates(j) for j in queries],
+                                         items_per_call=len(cv_profiles), memory_samples=memory_samples)
+    cv_queries = rng.integers(len(cv_profiles), size=n_queries)
+    results["match_many_jobs"] = measure([lambda i=i: rank_jobs(i) for i in cv_queries],
+                                         items_per_call=len(job_profiles), memory_samples=memory_samples)
+    return results
+
+def _insert(table, rows):
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        db.session.execute(db.insert(table), rows[start:start + INSERT_CHUNK_SIZE])
+
+def populate(cvs, jobs):
+    """
+    Fills the database from the corpus ground truth, without running the NLP
+    pipeline. The first candidate and the company log in with the password
+    'benchmark'.
+    """
+    db.drop_all()
+    db.create_all()
+    now = datetime.utcnow()
+    index = JobIndex()
+    skill_ids = {name: i + 1 for i, name in enumerate(VOCABULARY)}
+    _insert(Skill.__table__, [{"id": skill_id, "name": name} for name, skill_id in skill_ids.items()])
+
+    users, candidates, tags = [], [], []
+    for i, cv in enumerate(cvs, start=1):
+        email = "candidate@example.com" if i == 1 else f"cv{i}-{cv.email}"
+        users.append({"id": i, "email": email, "role": "candidate", "created_at": now})
+        candidates.append({
+            "id": i, "user_id": i, "first_name": cv.first_name, "last_name": cv.last_name,
+            "skills": json.dumps({"skills": cv.skills}), "education": json.dumps(cv.education),
+            "experience": "{}", "cleaned_text": cv.text, "analysis_status": "done", "analyzed_at": now
+        })
+        tags.extend({"candidate_id": i, "skill_id": skill_ids[skill]} for skill in cv.skills)
+    for start in range(0, len(candidates), INSERT_CHUNK_SIZE):
+        chunk = candidates[start:start + INSERT_CHUNK_SIZE]
+        counts = index.term_counts([row["cleaned_text"] for row in chunk])
+        for k, row in enumerate(chunk):
+            row["text_vector"] = serialize_vector(counts[k])
+    company_user_id = len(users) + 1
+    users.append({"id": company_user_id, "email": "company@example.com", "role": "company", "created_at": now})
+    _insert(User.__table__, users)
+    _insert(Candidate.__table__, candidates)
+    _insert(candidate_skill, tags)
+    _insert(Company.__table__, [{"id": 1, "user_id": company_user_id, "name": "Benchmark"}])
+    _insert(JobOffer.__table__, [{
+        "id": j, "company_id": 1, "title": job.title, "description": job.description,
+        "requirements": job.requirements, "skills": json.dumps({"skills": job.skills}),
+        "education": json.dumps(job.education), "created_at": now
+    } for j, job in enumerate(jobs, start=1)])
+    for user in (db.session.get(User, 1), db.session.get(User, company_user_id)):
+        user.set_password("benchmark")
+    db.session.commit()
+
+def bench_routes(app, cvs, jobs, n_requests: int, memory_samples: int) -> Dict[str, Dict[str, Any]]:
+    """
+    End-to-end rendering of the two recommendation routes through the test
+    client, without the response cache; list_jobs_cached times the same
+    page served from it.
+    """
+    with app.app_context():
+        populate(cvs, jobs)
+    candidate_client, company_client = app.test_client(), app.test_client()
+    candidate_client.post('/auth/login', data={"email": "candidate@example.com", "password": "benchmark"})
+    company_client.post('/auth/login', data={"email": "company@example.com", "password": "benchmark"})
+
+    def get(client, url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+
+    job_urls = [f"/jobs/{j}/candidates" for j in range(1, min(n_requests, len(jobs)) + 1)]
+    results = {
+        # First views fill the materialized scores
+        "list_jobs_cold": measure([lambda: get(candidate_client, "/jobs/")], memory_samples=0),
+        "job_candidates_cold": measure([lambda url=url: get(company_client, url) for url in job_urls],
+                                       memory_samples=0),
+    }
+    results["list_jobs"] = measure([lambda: get(candidate_client, "/jobs/")] * n_requests,
+                                   memory_samples=memory_samples)
+    results["job_candidates"] = measure([lambda url=url: get(company_client, url) for url in job_urls],
+                                        memory_samples=memory_samples)
+    results["job_candidates_page_2"] = measure([lambda url=url: get(company_client, url + "?page=2")
+                                                for url in job_urls], memory_samples=memory_samples)
+
+    app.extensions['response_cache'] = MemoryCache(app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+                                                   app.config['RESPONSE_CACHE_TTL'])
+    get(candidate_client, "/jobs/")
+    results["list_jobs_cached"] = measure([lambda: get(candidate_client, "/jobs/")] * n_requests,
+                                          memory_samples=memory_samples)
+    del app.extensions['response_cache']
+    return results
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    """Prints the p50 ratio of each stage against a baseline; False if any regressed past tolerance."""
+    ok = True
+    for stage, metrics in results["results"].items():
+        before = baseline.get("results", {}).get(stage)
+        if not before or not before.get("p50_ms") or metrics["p50_ms"] is None:
+            continue
+        ratio = metrics["p50_ms"] / before["p50_ms"]
+        regressed = ratio > 1 + tolerance
+        ok = ok and not regressed
+        print(f"{stage:32s} {before['p50_ms']:>10.3f} -> {metrics['p50_ms']:>10.3f} ms  x{ratio:.2f}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return ok
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cvs', type=int, default=1000, help='Synthetic CVs (1k to 1M).')
+    parser.add_argument('--jobs', type=int, default=200, help='Synthetic job offers.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--french-ratio', type=float, default=0.5, help='Share of French documents.')
+    parser.add_argument('--files', type=int, default=50, help='DOCX files for the extraction benchmark.')
+    parser.add_argument('--sample', type=int, default=200, help='CVs for the NLP preprocessing benchmark.')
+    parser.add_argument('--batch-size', type=int, default=32, help='nlp.pipe batch size.')
+    parser.add_argument('--pairs', type=int, default=1000, help='Pairs for the single-pair benchmark.')
+    parser.add_argument('--queries', type=int, default=20, help='Full rankings / route requests per benchmark.')
+    parser.add_argument('--memory-samples', type=int, default=5, help='Calls replayed under tracemalloc.')
+    parser.add_argument('--stages', default='extraction,preprocessing,matching,routes',
+                        help='Comma-separated stages to run.')
+    parser.add_argument('--output', help='Write the JSON report to this file (default: stdout).')
+    parser.add_argument('--baseline', help='JSON report to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p50 slowdown before failing.')
+    args = parser.parse_args(argv)
+    stages = set(args.stages.split(','))
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['UPLOAD_FOLDER'] = os.path.join(_WORKDIR, 'uploads')
+
+    start = time.perf_counter()
+    cvs = list(iter_cvs(args.cvs, args.seed, args.french_ratio))
+    jobs = list(iter_jobs(args.jobs, args.seed, args.french_ratio))
+    generation = time.perf_counter() - start
+    cv_profiles = [cv_profile(cv) for cv in cvs]
+    job_profiles = [job_profile(job) for job in jobs]
+    warmup()
+
+    results = {}
+    if 'extraction' in stages:
+        results["extract_docx"] = bench_extraction(cvs, args.files, args.memory_samples)
+    if 'preprocessing' in stages:
+        results.update(bench_preprocessing([cv.text for cv in cvs[:args.sample]], args.batch_size,
+                                           args.memory_samples))
+    if 'matching' in stages:
+        results.update(bench_matching(cv_profiles, job_profiles, args.pairs, args.queries, args.memory_samples))
+    if 'routes' in stages:
+        results.update(bench_routes(app, cvs, jobs, args.queries, args.memory_samples))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec='seconds'),
+            "cvs": args.cvs,
+            "jobs": args.jobs,
+            "seed": args.seed,
+            "french_ratio": args.french_ratio,
+            "generation_seconds": round(generation, 3),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "spacy_model": model_version(),
+            "keywords_version": KEYWORDS_VERSION,
+            # ru_maxrss is in kilobytes on Linux
+            "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        },
+        "results": results
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        return 0 if compare(report, baseline, args.tolerance) else 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
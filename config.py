@@ -1,4 +1,6 @@
+import json
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,6 +11,72 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max size
     ALLOWED_EXTENSIONS = {'pdf', 'docx'}
+    CANDIDATES_PER_PAGE = int(os.environ.get('CANDIDATES_PER_PAGE', 20))
+    # Seconds before a worker looks for profiles analysed by the other workers
+    SKILL_INDEX_SYNC_INTERVAL = float(os.environ.get('SKILL_INDEX_SYNC_INTERVAL', 10))
+    # Seconds between full reloads, for profiles committed too late for the incremental sync
+    SKILL_INDEX_FULL_SYNC_INTERVAL = float(os.environ.get('SKILL_INDEX_FULL_SYNC_INTERVAL', 900))
+    # CV analysis runs on a background process pool unless disabled
+    INGESTION_ASYNC = os.environ.get('INGESTION_ASYNC', '1') == '1'
+    INGESTION_WORKERS = int(os.environ.get('INGESTION_WORKERS', 2))
+    # Only the process holding this lock (one per host) runs the pool; the others' uploads
+    # are picked up by its poll. Claims older than the timeout are released, e.g. after a worker recycle
+    INGESTION_LOCK_FILE = os.environ.get('INGESTION_LOCK_FILE') or \
+        os.path.join(tempfile.gettempdir(), 'cv-ingestion.lock')
+    INGESTION_POLL_INTERVAL = float(os.environ.get('INGESTION_POLL_INTERVAL', 2))
+    INGESTION_CLAIM_TIMEOUT = float(os.environ.get('INGESTION_CLAIM_TIMEOUT', 600))
+    # Extraction budget per CV (pages, characters, seconds)
+    EXTRACTION_MAX_PAGES = int(os.environ.get('EXTRACTION_MAX_PAGES', 30))
+    EXTRACTION_MAX_CHARS = int(os.environ.get('EXTRACTION_MAX_CHARS', 200000))
+    EXTRACTION_TIMEOUT = float(os.environ.get('EXTRACTION_TIMEOUT', 30))
+    # Content-addressed cache of CV analyses, evicted least recently used first
+    ANALYSIS_CACHE_FOLDER = os.environ.get('ANALYSIS_CACHE_FOLDER') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'analysis')
+    ANALYSIS_CACHE_MAX_BYTES = int(os.environ.get('ANALYSIS_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    # Rendered job lists and recommendations: 'memory' (per process), 'file' (shared by the
+    # workers of a host through RESPONSE_CACHE_FOLDER) or 'none'
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 300))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+    RESPONSE_CACHE_FOLDER = os.environ.get('RESPONSE_CACHE_FOLDER') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'pages')
+    # Seconds a logged-in user's row is reused by the next requests of a worker
+    # without querying it again, 0 to query on every request
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 10))
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 1024))
+    # Password hashing, as a werkzeug method ('scrypt:<n>:<r>:<p>' or
+    # 'pbkdf2:sha256:<iterations>'); older hashes are replaced on the next login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH', 16))
+    # Per-stage timings exposed on /metrics, and requests slower than this logged with their breakdown
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', 2.0))
+    # Directory where every worker writes its metrics, so that /metrics sums them (set by gunicorn.conf.py)
+    METRICS_MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    # Bearer token required on /metrics; without it, only local clients may scrape
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # Text similarity: 'tfidf', or 'embeddings' with EMBEDDING_MODEL, a local model read offline on CPU,
+    # either 'sentence-transformers:<directory>' or 'spacy:<model with vectors>' (e.g. fr_core_news_md).
+    # Offer embeddings are served from an approximate nearest-neighbour index in EMBEDDING_INDEX_FOLDER
+    SIMILARITY_BACKEND = os.environ.get('SIMILARITY_BACKEND', 'tfidf')
+    EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL', '')
+    EMBEDDING_INDEX_FOLDER = os.environ.get('EMBEDDING_INDEX_FOLDER') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'embeddings')
+    EMBEDDING_INDEX_PROBES = int(os.environ.get('EMBEDDING_INDEX_PROBES', 8))
+    # Beyond EMBEDDING_BRUTE_FORCE_MAX offers, a CV is only scored against its EMBEDDING_SHORTLIST
+    # nearest offers in the index and the offers sharing one of its skills
+    EMBEDDING_SHORTLIST = int(os.environ.get('EMBEDDING_SHORTLIST', 200))
+    EMBEDDING_BRUTE_FORCE_MAX = int(os.environ.get('EMBEDDING_BRUTE_FORCE_MAX', 2000))
+    # Scoring policy (JSON), empty values keep the defaults of app/nlp/scoring.py:
+    # {"skills": 0.5, "text": 0.3, "education": 0.2}, per-company overrides keyed
+    # by company id, and the diploma ranking {"bac": 1, ..., "doctorat": 5}
+    SCORING_WEIGHTS = json.loads(os.environ.get('SCORING_WEIGHTS') or '{}')
+    SCORING_COMPANY_WEIGHTS = json.loads(os.environ.get('SCORING_COMPANY_WEIGHTS') or '{}')
+    SCORING_EDUCATION_LEVELS = json.loads(os.environ.get('SCORING_EDUCATION_LEVELS') or '{}')
+    # JSON API: bearer tokens (JSON {"<token>": "<user email>"}) and maximum
+    # number of ids or texts per request
+    API_TOKENS = json.loads(os.environ.get('API_TOKENS') or '{}')
+    API_MAX_BATCH = int(os.environ.get('API_MAX_BATCH', 1000))
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -16,9 +84,31 @@ class DevelopmentConfig(Config):
         'sqlite:///' + os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'data', 'site.db')
 
 
+def engine_options(database_url):
+    """
+    Connection pool of each process (gunicorn worker): by default one
+    connection per thread (WEB_THREADS, see gunicorn.conf.py) plus a few for
+    the ingestion callbacks. Connections are checked before use and
+    recycled, so a database restart or a proxy idle timeout is not seen as
+    an error. On PostgreSQL, queries running longer than
+    DB_STATEMENT_TIMEOUT_MS (0 to disable) are cancelled.
+    """
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE') or os.environ.get('WEB_THREADS', 4)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 2)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+    }
+    statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+    if (database_url or '').startswith('postgres') and statement_timeout:
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
 class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
 
 config = {
     'development': DevelopmentConfig,
@@ -0,0 +1,26 @@
+import multiprocessing
+import os
+import tempfile
+
+# Loads the app, and with it the models and indexes (serving.warmup), once in
+# the master: the forked workers share that memory instead of each loading it
+preload_app = True
+
+# Each worker writes its metrics there and /metrics sums them (app/metrics.py);
+# a fresh directory per server start, so that counters restart from zero
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', tempfile.mkdtemp(prefix='cv-metrics-'))
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:5000')
+# Each worker is a process with its own GIL, each thread serves one request;
+# every worker keeps a database pool of WEB_THREADS connections (config.py)
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+# Workers are recycled now and then so memory fragmentation cannot grow forever
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+errorlog = '-'
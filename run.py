@@ -1,4 +1,4 @@
-from app import create_app, db
+from app import create_app, db, serving
 from app.models import User, Company, Candidate, JobOffer, Application
 
 app = create_app()
@@ -8,4 +8,6 @@ def make_shell_context():
     return {'db': db, 'User': User, 'Company': Company, 'Candidate': Candidate, 'JobOffer': JobOffer, 'Application': Application}
 
 if __name__ == '__main__':
+    # Loads the models before serving, so that /readyz reports ready
+    serving.warmup(app)
     app.run(debug=True)
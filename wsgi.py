@@ -0,0 +1,7 @@
+import os
+from app import create_app, serving
+
+# Production entry point, served by gunicorn (see gunicorn.conf.py):
+#   gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app(os.environ.get('FLASK_CONFIG', 'production'))
+serving.warmup(app)